@@ -92,6 +92,28 @@ DATABASES = {
 }
 
 
+# Caches
+# Default cache is local to each worker process. Entries in it are keyed by versions of what they depend on.
+# Shared cache is seen by all the workers: version stamps that tell the others to reload live there.
+
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+    },
+    'shared': {
+        'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache',
+        'LOCATION': os.path.join(SITE_DIR, 'cache'),
+    },
+}
+
+if len(sys.argv) > 1 and sys.argv[1] == 'test':
+    # Tests must not change version stamps of the workers running on the same host
+    CACHES['shared'] = {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'LOCATION': 'shared',
+    }
+
+
 # Password validation
 # https://docs.djangoproject.com/en/1.10/ref/settings/#auth-password-validators
 
@@ -134,6 +156,9 @@ STATICFILES_DIRS = (
     # Don't forget to use absolute paths, not relative paths.
 )
 
+# Weekly report snapshots, one directory per week
+TASKS_SNAPSHOT_DIR = os.path.join(SITE_DIR, 'snapshots')
+
 LOGGING = {
     'version': 1,
     'disable_existing_loggers': False,
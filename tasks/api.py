@@ -0,0 +1,158 @@
+import datetime
+from django.http import Http404, HttpResponseBadRequest, JsonResponse
+from django.shortcuts import get_object_or_404
+from django.utils.decorators import method_decorator
+from django.views.generic import View
+from .calculate_finish_date import calculate_finish_dates
+from .models import FINISHED_PHASE_NAMES, Project, Task
+from .project import conditional_report
+from .schedule import ScheduleRow
+
+DEFAULT_LIMIT = 100
+MAX_LIMIT = 1000
+# Compact output: no spaces after separators
+JSON_PARAMS = {'separators': (',', ':')}
+
+
+def _name(obj, field):
+    related = getattr(obj, field)
+    return related.name if related else None
+
+
+def _forecast_date(forecast, task, which):
+    return forecast.dates(task.pk)[which] if forecast else None
+
+
+PROJECT_FIELDS = {
+    'name': lambda project: project.name,
+    'title': lambda project: project.title,
+    'task_count': lambda project: project.total_task_count,
+    'work_left': lambda project: project.total_work_left,
+    'finish_date': lambda project: project.finish_date,
+    'version': lambda project: project.version,
+    'url': lambda project: project.get_absolute_url(),
+}
+
+TASK_FIELDS = {
+    'name': lambda task, row, forecast: task.name,
+    'title': lambda task, row, forecast: task.title,
+    'project': lambda task, row, forecast: task.project.name,
+    'order': lambda task, row, forecast: task.order,
+    'phase': lambda task, row, forecast: _name(task, 'phase'),
+    'priority': lambda task, row, forecast: _name(task, 'priority'),
+    'owner': lambda task, row, forecast: task.owner.username if task.owner else None,
+    'work_done': lambda task, row, forecast: task.work_done,
+    'work_left': lambda task, row, forecast: task.work_left,
+    'cumulative_work_before': lambda task, row, forecast: row.cumulative_work_before if row else None,
+    'cumulative_work_left': lambda task, row, forecast: row.cumulative_work_left if row else None,
+    'start_date': lambda task, row, forecast: row.start_date if row else None,
+    'finish_date': lambda task, row, forecast: row.finish_date if row else None,
+    # Owners working in parallel
+    'forecast_start_date': lambda task, row, forecast: _forecast_date(forecast, task, 0),
+    'forecast_finish_date': lambda task, row, forecast: _forecast_date(forecast, task, 1),
+    'url': lambda task, row, forecast: task.get_absolute_url(),
+}
+# Fields that need the forecast of the whole project
+FORECAST_FIELD_NAMES = ['forecast_start_date', 'forecast_finish_date']
+
+
+class ApiError(ValueError):
+    pass
+
+
+def selected_fields(request, fields):
+    """ Fields given as comma separated 'fields' parameter, or all of them """
+    names = [name for name in request.GET.get('fields', '').split(',') if name]
+    unknown = [name for name in names if name not in fields]
+    if unknown:
+        raise ApiError('Unknown fields: %s' % ', '.join(unknown))
+    return [(name, fields[name]) for name in names or fields]
+
+
+def page_limit(request):
+    limit = request.GET.get('limit', '')
+    if not limit:
+        return DEFAULT_LIMIT
+    if not limit.isdigit() or not 0 < int(limit) <= MAX_LIMIT:
+        raise ApiError('Limit must be from 1 to %d' % MAX_LIMIT)
+    return int(limit)
+
+
+def page_response(items, limit, cursor, serialize):
+    """
+    One page of results from at most limit + 1 items. Extra item only tells that there is a next page.
+    'next' is the cursor of the next page, to be given as 'after': name of last item on this page
+    """
+    page = items[:limit]
+    next_cursor = cursor(page[-1]) if len(items) > limit else None
+    return JsonResponse({'results': [serialize(item) for item in page], 'next': next_cursor},
+                        json_dumps_params=JSON_PARAMS)
+
+
+class ApiView(View):
+    """ Read only JSON. Bad parameters are answered with 400 Bad Request """
+    def get(self, request, *args, **kwargs):
+        try:
+            return self.get_json(request, *args, **kwargs)
+        except ApiError as error:
+            return HttpResponseBadRequest(str(error))
+
+    def get_json(self, request, *args, **kwargs):
+        raise NotImplementedError
+
+
+@method_decorator(conditional_report, name='get')
+class ApiProjectList(ApiView):
+    """ Projects ordered by name, with totals and finish date. Pages are sought by name, not counted """
+    def get_json(self, request, *args, **kwargs):
+        fields = selected_fields(request, PROJECT_FIELDS)
+        limit = page_limit(request)
+        projects = Project.objects.select_related('created_by').order_by('name')
+        after = request.GET.get('after')
+        if after:
+            projects = projects.filter(name__gt=after)
+        return page_response(list(projects[:limit + 1]), limit, lambda project: project.name,
+                             lambda project: dict((name, value(project)) for name, value in fields))
+
+
+@method_decorator(conditional_report, name='get')
+class ApiProjectTasks(ApiView):
+    """
+    Unfinished tasks of project in schedule order, with cumulative work and dates.
+    Schedule is calculated from all of them in one query, so a page is a slice of it
+    """
+    def get_json(self, request, *args, **kwargs):
+        fields = selected_fields(request, TASK_FIELDS)
+        limit = page_limit(request)
+        project = get_object_or_404(Project, name=kwargs['slug'])
+        rows = project.schedule.rows
+        after = request.GET.get('after')
+        if after:
+            names = [row.task.name for row in rows]
+            if after not in names:
+                raise ApiError('Unknown task: %s' % after)
+            rows = rows[names.index(after) + 1:]
+        forecast = project.forecast
+        return page_response(rows[:limit + 1], limit, lambda row: row.task.name,
+                             lambda row: dict((name, value(row.task, row, forecast)) for name, value in fields))
+
+
+class ApiTask(ApiView):
+    """ Single task. Dates are given only for unfinished tasks """
+    def get_json(self, request, *args, **kwargs):
+        fields = selected_fields(request, TASK_FIELDS)
+        # Window sums are calculated over the tasks of the project, so the task is picked after the query
+        tasks = Task.objects.filter(project__name=kwargs['project_name']).with_related().with_cumulative_work()
+        task = next((task for task in tasks if task.name == kwargs['slug']), None)
+        if task is None:
+            raise Http404('No task %s in project %s' % (kwargs['slug'], kwargs['project_name']))
+        row = None
+        forecast = None
+        if not task.phase or task.phase.name not in FINISHED_PHASE_NAMES:
+            before = task.cumulative_work_before
+            start_date, finish_date = calculate_finish_dates(datetime.date.today(), [before, before + task.work_left])
+            row = ScheduleRow(task, before, start_date, finish_date)
+            if any(name in FORECAST_FIELD_NAMES for name, value in fields):
+                forecast = task.project.forecast
+        return JsonResponse(dict((name, value(task, row, forecast)) for name, value in fields),
+                            json_dumps_params=JSON_PARAMS)
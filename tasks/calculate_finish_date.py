@@ -1,24 +1,60 @@
 import datetime
 
+# Business calendar used for all schedule calculations. Work is done only from Mon to Fri,
+# so a week contains WORK_DAYS_IN_WEEK working days and every date calculation is done
+# in constant time using whole weeks plus a remainder instead of stepping one day at a time.
+WORK_DAYS_IN_WEEK = 5
+DAYS_IN_WEEK = 7
+WEEKEND_LENGTH = DAYS_IN_WEEK - WORK_DAYS_IN_WEEK
+
+
+def first_working_day(date):
+    """ If date is Sat or Sun, fast forward to Mon. Otherwise return date as is """
+    weekday = date.weekday()
+    if weekday >= WORK_DAYS_IN_WEEK:
+        return date + datetime.timedelta(days=DAYS_IN_WEEK - weekday)
+    return date
+
+
+def _add_working_days(start_date, days_of_work):
+    # start_date must already be a working day
+    if days_of_work <= 0:
+        return start_date
+    weeks, remainder = divmod(days_of_work, WORK_DAYS_IN_WEEK)
+    days = weeks * DAYS_IN_WEEK + remainder
+    if start_date.weekday() + remainder >= WORK_DAYS_IN_WEEK:
+        days += WEEKEND_LENGTH  # Remainder crosses a weekend
+    return start_date + datetime.timedelta(days=days)
+
 
 def calculate_finish_date(start_date, days_of_work):
     # Calculate when a task is finished
     # -it is started on start_date
     # -it requires days_of_work
     # and working only from Mon to Fri
-    one_day = datetime.timedelta(days=1)
-    # If start date is Sat or Sun, fast forward to Mon
-    if start_date.weekday() == 5:
-        start_date += one_day
-    if start_date.weekday() == 6:
-        start_date += one_day
-
-    finish_date = start_date
-    for day in range(0, days_of_work):
-        finish_date += one_day
-        if finish_date.weekday() == 6:  # Sunday. add one extra day to skip to Monday
-            finish_date += one_day
-        elif finish_date.weekday() == 5: # Saturday, add two extra days to skip to Monday
-            finish_date += one_day
-            finish_date += one_day
-    return finish_date
+    return _add_working_days(first_working_day(start_date), days_of_work)
+
+
+def calculate_finish_dates(start_date, offsets):
+    """ Batch version of calculate_finish_date. Returns finish date for each offset (days of work) """
+    start_date = first_working_day(start_date)
+    return [_add_working_days(start_date, days_of_work) for days_of_work in offsets]
+
+
+def working_days(start_date, count):
+    """ List of first count working days starting from start_date. For chart headers """
+    return calculate_finish_dates(start_date, range(0, count))
+
+
+def work_days_string(days):
+    """ Amount of work as human readable string. Four weeks are counted as a month """
+    weeks = int(days / WORK_DAYS_IN_WEEK)
+    days = days % WORK_DAYS_IN_WEEK
+    months = int(weeks / 4)
+    weeks = weeks % 4
+    if months > 0:
+        return '%d month(s), %d week(s), %d day(s)' % (months, weeks, days)
+    elif weeks > 0:
+        return '%d week(s), %d day(s)' % (weeks, days)
+    else:
+        return '%d day(s)' % days
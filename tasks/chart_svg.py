@@ -0,0 +1,47 @@
+from django.utils.html import escape
+from .templatetags.gantt import bar_color
+
+LABEL_WIDTH = 200
+DAY_WIDTH = 6
+ROW_HEIGHT = 16
+BAR_HEIGHT = 12
+HEADER_HEIGHT = 20
+FOOTER_HEIGHT = 20
+FILL_COLORS = {
+    'yellow': 'rgb(180,180,0)',
+    'red': 'red',
+    'green': 'green',
+}
+
+
+def render_chart_svg(schedule):
+    """
+    Gantt chart of schedule as SVG document. One rect per task and one tick per week.
+    Built from strings without the template engine, so size and time grow only with tasks and weeks.
+    """
+    width = LABEL_WIDTH + DAY_WIDTH * schedule.total_work_left + 2 * LABEL_WIDTH
+    height = HEADER_HEIGHT + ROW_HEIGHT * len(schedule.rows) + FOOTER_HEIGHT
+    parts = ['<svg xmlns="http://www.w3.org/2000/svg" width="%d" height="%d" font-family="sans-serif" '
+             'font-size="11">' % (width, height)]
+
+    for day_number, day in enumerate(schedule.days):
+        if day_number == 0 or day.weekday() == 0:
+            x = LABEL_WIDTH + DAY_WIDTH * day_number
+            parts.append('<line x1="%d" y1="%d" x2="%d" y2="%d" stroke="#aaa"/><text x="%d" y="%d">%s</text>' % (
+                x, HEADER_HEIGHT - 4, x, height - FOOTER_HEIGHT, x + 2, HEADER_HEIGHT - 6, day.strftime('%m-%d')))
+
+    for row_number, row in enumerate(schedule.rows):
+        y = HEADER_HEIGHT + ROW_HEIGHT * row_number
+        x = LABEL_WIDTH + DAY_WIDTH * row.cumulative_work_before
+        parts.append('<text x="2" y="%d">%s</text>' % (y + BAR_HEIGHT, escape(row.task.title)))
+        if row.work_left:
+            parts.append('<rect x="%d" y="%d" width="%d" height="%d" fill="%s"/>' % (
+                x, y + (ROW_HEIGHT - BAR_HEIGHT) // 2, DAY_WIDTH * row.work_left, BAR_HEIGHT,
+                FILL_COLORS[bar_color(row.task)]))
+        parts.append('<text x="%d" y="%d">%s</text>' % (
+            x + DAY_WIDTH * row.work_left + 4, y + BAR_HEIGHT, row.finish_date.strftime('%m-%d')))
+
+    parts.append('<text x="2" y="%d">Total: %s. Estimated finish date: %s</text>' % (
+        height - 6, escape(schedule.total_work_left_string), schedule.finish_date.strftime('%Y-%m-%d')))
+    parts.append('</svg>')
+    return ''.join(parts)
@@ -1,19 +1,42 @@
+from django.core import checks
+from django.db import connection
 from .models import Phase
 
+REQUIRED_PHASE_NAMES = ['pending', 'ongoing', 'continuing', 'finished', 'done', 'blocked', 'impediment']
+
+# Invalidities of the currently cached phases. Replaced as a whole, so other threads never see it half updated
+_checked = {}
+
 
 def check_phase(name):
-    if Phase.objects.filter(name=name).count() == 0:
-       return 'Phase %s not defined' % name
-    if Phase.objects.filter(name=name).count() > 1:
-        return 'Multiple phases with name: %s' % name
+    if Phase.objects.get_cached(name) is None:
+        return 'Phase %s not defined' % name
     return ''
 
 
 def check_validity():
-    invalidities = []
-    phase_names = ['pending', 'ongoing', 'continuing', 'finished', 'done', 'blocked', 'impediment']
-    for phase_name in phase_names:
-        msg = check_phase(phase_name)
-        if msg:
-            invalidities.append(msg)
-    return invalidities
+    """ Checked once per loaded set of phases: phases are fetched in one query and cached until they change """
+    global _checked
+    checked = _checked
+    phases = Phase.objects.cached()
+    if checked.get('phases') is not phases:
+        invalidities = []
+        for phase_name in REQUIRED_PHASE_NAMES:
+            msg = check_phase(phase_name)
+            if msg:
+                invalidities.append(msg)
+        checked = {'phases': phases, 'invalidities': invalidities}
+        _checked = checked
+    return list(checked['invalidities'])
+
+
+@checks.register('tasks', checks.Tags.database)
+def check_phases(app_configs, **kwargs):
+    """
+    Same check as on the project list. Queries the database, so it is run only by migrate
+    and by manage.py check --tag database
+    """
+    if Phase._meta.db_table not in connection.introspection.table_names():
+        # Tables have not been created yet
+        return []
+    return [checks.Warning(msg, hint='Create the phase in admin.', id='tasks.W001') for msg in check_validity()]
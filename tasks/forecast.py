@@ -0,0 +1,94 @@
+import datetime
+import heapq
+from collections import deque
+from django.core.cache import cache
+from .calculate_finish_date import calculate_finish_date, calculate_finish_dates
+
+CACHE_TIMEOUT = 24 * 60 * 60
+
+
+def simulate(tasks):
+    """
+    Work of tasks divided between their owners. tasks are (owner_id, work_left) in priority order.
+    Every owner works on one task at a time, one day of work per working day, taking the first task
+    in priority order of own tasks and tasks without owner. Tasks without owner are therefore done by
+    whoever is free first, or by one worker if no task has an owner.
+    Workers are kept in a heap by the day they become free, so each task costs O(log owners).
+    Returns (start, finish) of each task as working days from start of schedule.
+    """
+    own = {}
+    pool = deque()
+    for index, (owner_id, work_left) in enumerate(tasks):
+        if owner_id is None:
+            pool.append(index)
+        else:
+            own.setdefault(owner_id, deque()).append(index)
+    # (day when free, position, owner). Position breaks ties, so owners are never compared
+    workers = [(0, position, owner_id) for position, owner_id in enumerate(sorted(own) or [None])]
+    heapq.heapify(workers)
+    times = [None] * len(tasks)
+    while workers:
+        day, position, owner_id = heapq.heappop(workers)
+        queue = own.get(owner_id)
+        if queue and (not pool or queue[0] < pool[0]):
+            index = queue.popleft()
+        elif pool:
+            index = pool.popleft()
+        else:
+            continue  # Nothing left for this worker
+        finish = day + tasks[index][1]
+        times[index] = (day, finish)
+        heapq.heappush(workers, (finish, position, owner_id))
+    return times
+
+
+class Forecast(object):
+    """ Start and finish dates of tasks when their owners work in parallel """
+    def __init__(self, task_ids, times, start_date=None):
+        if start_date is None:
+            start_date = datetime.date.today()
+        self.start_date = start_date
+        self.times = dict(zip(task_ids, times))
+        self.total_days = max([finish for start, finish in times] or [0])
+        self._dates = None
+
+    @classmethod
+    def build(cls, tasks, start_date=None):
+        """ Forecast of already fetched tasks in priority order """
+        tasks = list(tasks)
+        times = simulate([(task.owner_id, task.work_left) for task in tasks])
+        return cls([task.pk for task in tasks], times, start_date)
+
+    @property
+    def finish_date(self):
+        return calculate_finish_date(self.start_date, self.total_days)
+
+    def dates(self, task_id):
+        """ (start date, finish date) of task, or (None, None) if task is not in forecast """
+        if self._dates is None:
+            # Dates of all tasks in one batch the first time they are needed
+            task_ids = list(self.times)
+            times = list(self.times.values())
+            dates = calculate_finish_dates(self.start_date, [start for start, finish in times] +
+                                           [finish for start, finish in times])
+            self._dates = dict(zip(task_ids, zip(dates[:len(task_ids)], dates[len(task_ids):])))
+        return self._dates.get(task_id, (None, None))
+
+
+def project_forecast(project, start_date=None):
+    """
+    Forecast of unfinished tasks of project. Working days do not depend on start date, so they are
+    simulated once per project version and cached. Tasks are read with one query only if they have not
+    already been fetched for the schedule of project
+    """
+    key = 'tasks:forecast:%s' % project.cache_version
+    cached = cache.get(key)
+    if cached is None:
+        if 'schedule' in project.__dict__:
+            rows = [(row.task.pk, row.task.owner_id, row.task.work_left) for row in project.schedule.rows]
+        else:
+            rows = list(project.tasks_unfinished.values_list('id', 'owner_id', 'work_left'))
+        cached = ([task_id for task_id, owner_id, work_left in rows],
+                  simulate([(owner_id, work_left) for task_id, owner_id, work_left in rows]))
+        cache.set(key, cached, CACHE_TIMEOUT)
+    return Forecast(cached[0], cached[1], start_date)
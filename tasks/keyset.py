@@ -0,0 +1,98 @@
+import base64
+import binascii
+import json
+from django.core.exceptions import ValidationError
+from django.db.models import Q
+from django.http import Http404
+from django.urls import reverse
+from django.utils.http import urlencode
+
+
+def encode_cursor(values):
+    return base64.urlsafe_b64encode(json.dumps(values).encode('utf-8')).decode('ascii')
+
+
+def decode_cursor(cursor, length):
+    """ Values encoded with encode_cursor. Http404 if cursor is not valid, as for unknown page numbers """
+    try:
+        values = json.loads(base64.urlsafe_b64decode(cursor.encode('ascii')).decode('utf-8'))
+    except (ValueError, UnicodeError, binascii.Error):
+        raise Http404('Invalid cursor')
+    if not isinstance(values, list) or len(values) != length:
+        raise Http404('Invalid cursor')
+    return values
+
+
+def clean_cursor(model, fields, values):
+    """ Cursor values converted to types of keyset fields. Http404 if they do not fit, as for invalid cursors """
+    cleaned = []
+    for field, value in zip(fields, values):
+        if value is None or isinstance(value, (list, dict)):
+            raise Http404('Invalid cursor')
+        try:
+            cleaned.append(model._meta.get_field(field).to_python(value))
+        except ValidationError:
+            raise Http404('Invalid cursor')
+    return cleaned
+
+
+def after_filter(fields, values):
+    """ Q matching rows that come after given values when ordered by fields """
+    condition = Q()
+    equal = {}
+    for field, value in zip(fields, values):
+        condition |= Q(**dict(equal, **{field + '__gt': value}))
+        equal[field] = value
+    return condition
+
+
+class KeysetPaginationMixin(object):
+    """
+    ListView that shows one page at a time. Next page is sought with the values of keyset fields
+    in last row of the previous page, given as 'after' cursor, instead of counting rows to skip.
+    Cost of a page does not depend on how far it is. Last keyset field must be unique.
+    Object list is a list, so context_object_name and template_name must be given.
+    'More' link of a page leads to the next full page (page_url_name) and gives the URL of the next rows
+    only (more_url_name), so that they can be loaded into the same page
+    """
+    keyset = ['id']
+    page_size = 50
+    max_page_size = 500
+    page_url_name = None
+    more_url_name = None
+
+    def get_page_size(self):
+        page_size = self.request.GET.get('page_size', '')
+        if page_size.isdigit() and int(page_size) > 0:
+            return min(int(page_size), self.max_page_size)
+        return self.page_size
+
+    def get_queryset(self):
+        queryset = super(KeysetPaginationMixin, self).get_queryset().order_by(*self.keyset)
+        after = self.request.GET.get('after')
+        if after:
+            values = clean_cursor(queryset.model, self.keyset, decode_cursor(after, len(self.keyset)))
+            queryset = queryset.filter(after_filter(self.keyset, values))
+        # One extra row tells whether there is a next page
+        page_size = self.get_page_size()
+        rows = list(queryset[:page_size + 1])
+        self.next_cursor = None
+        if len(rows) > page_size:
+            rows = rows[:page_size]
+            self.next_cursor = encode_cursor([getattr(rows[-1], field) for field in self.keyset])
+        return rows
+
+    def get_context_data(self, **kwargs):
+        context = super(KeysetPaginationMixin, self).get_context_data(**kwargs)
+        context['next_url'] = None
+        context['more_url'] = None
+        if self.next_cursor:
+            params = {'after': self.next_cursor}
+            if 'page_size' in self.request.GET:
+                params['page_size'] = self.get_page_size()
+            query = urlencode(params)
+            page_path = reverse(self.page_url_name) if self.page_url_name else self.request.path
+            context['next_url'] = '%s?%s' % (page_path, query)
+            if self.more_url_name:
+                context['more_url'] = '%s?%s' % (reverse(self.more_url_name), query)
+        return context
@@ -0,0 +1,57 @@
+import time
+from django.core.management.base import BaseCommand
+from django.template.loader import render_to_string
+from tasks.chart_svg import render_chart_svg
+from tasks.forecast import Forecast
+from tasks.models import Phase, Project, Task
+from tasks.schedule import Schedule
+
+PHASE_NAMES = ['ongoing', 'continuing', 'blocked', 'pending']
+
+
+def example_project(task_count, work_left, owner_count=0):
+    """
+    Unsaved project whose schedule has task_count tasks of work_left days each. Every third task has no owner,
+    others are divided between owner_count owners
+    """
+    project = Project(name='benchmark', title='Benchmark')
+    phases = [Phase(name=name) for name in PHASE_NAMES]
+    tasks = [Task(project=project, name='task_%d' % i, title='Task %d' % i, order=i, work_left=work_left,
+                  phase=phases[i % len(phases)], owner_id=i % owner_count + 1 if owner_count and i % 3 else None)
+             for i in range(0, task_count)]
+    project.schedule = Schedule(tasks)
+    start = time.perf_counter()
+    project.forecast = Forecast.build(tasks)
+    project.forecast_seconds = time.perf_counter() - start
+    return project
+
+
+def render_chart(project, day_cells):
+    """ Rendered chart and time it took to render it in seconds """
+    start = time.perf_counter()
+    html = render_to_string('tasks/project/chart.html', {'project': project, 'day_cells': day_cells})
+    return html, time.perf_counter() - start
+
+
+class Command(BaseCommand):
+    help = 'Compare size and rendering time of Gantt chart with one cell per bar segment, one cell per day and SVG'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--tasks', type=int, default=200, help='Number of tasks')
+        parser.add_argument('--work-left', type=int, default=3, help='Days of work left in each task')
+        parser.add_argument('--owners', type=int, default=4, help='Number of task owners working in parallel')
+
+    def handle(self, *args, **options):
+        project = example_project(options['tasks'], options['work_left'], options['owners'])
+        self.stdout.write('%d tasks, %d days of work' % (options['tasks'], project.schedule.total_work_left))
+        self.stdout.write('forecast : %d days with %d owners, simulated in %.3f s' % (
+            project.forecast.total_days, options['owners'], project.forecast_seconds))
+        sizes = {}
+        for mode, day_cells in [('day cells', True), ('bar cells', False)]:
+            html, seconds = render_chart(project, day_cells)
+            sizes[mode] = len(html.encode())
+            self.stdout.write('%-9s: %d bytes, %d cells, %.3f s' % (mode, sizes[mode], html.count('<td'), seconds))
+        self.stdout.write('Bar cells are %.1f%% of day cells' % (100.0 * sizes['bar cells'] / sizes['day cells']))
+        start = time.perf_counter()
+        svg = render_chart_svg(project.schedule)
+        self.stdout.write('%-9s: %d bytes, %.3f s' % ('svg', len(svg.encode()), time.perf_counter() - start))
@@ -0,0 +1,36 @@
+import os
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+from tasks.models import Project
+from tasks.task_import import PARSERS, TaskImportError, import_tasks
+
+
+class Command(BaseCommand):
+    help = 'Import tasks to the end of project from CSV or JSON lines file'
+
+    def add_arguments(self, parser):
+        parser.add_argument('project', help='Name of project')
+        parser.add_argument('file', help='CSV file with header line or JSON lines file')
+        parser.add_argument('--format', choices=sorted(PARSERS),
+                            help='Format of file. Guessed from file extension if not given')
+        parser.add_argument('--user', help='Username of creator of tasks. Creator of project if not given')
+
+    def handle(self, *args, **options):
+        project = Project.objects.filter(name=options['project']).first()
+        if not project:
+            raise CommandError('Unknown project: %s' % options['project'])
+        user = project.created_by
+        if options['user']:
+            user = User.objects.filter(username=options['user']).first()
+            if not user:
+                raise CommandError('Unknown user: %s' % options['user'])
+        file_format = options['format'] or os.path.splitext(options['file'])[1].lstrip('.')
+        if file_format not in PARSERS:
+            raise CommandError('Unknown format: %s' % file_format)
+
+        with open(options['file'], newline='', encoding='utf-8') as lines:
+            try:
+                count = import_tasks(project, PARSERS[file_format](lines), user)
+            except TaskImportError as error:
+                raise CommandError('Nothing imported. %s' % error)
+        self.stdout.write('Imported %d task(s) to %s' % (count, project.name))
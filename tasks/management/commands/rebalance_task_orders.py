@@ -0,0 +1,20 @@
+from django.core.management.base import BaseCommand, CommandError
+from tasks.models import Project
+from tasks.task_order import rebalance_orders
+
+
+class Command(BaseCommand):
+    help = 'Spread orders of tasks evenly, so that tasks can again be moved by updating only one row'
+
+    def add_arguments(self, parser):
+        parser.add_argument('projects', nargs='*', help='Names of projects. All projects if not given')
+
+    def handle(self, *args, **options):
+        projects = None
+        if options['projects']:
+            projects = list(Project.objects.filter(name__in=options['projects']).values_list('id', flat=True))
+            if len(projects) != len(set(options['projects'])):
+                raise CommandError('Unknown project in: %s' % ' '.join(options['projects']))
+
+        changed = rebalance_orders(projects)
+        self.stdout.write('Changed order of %d task(s)' % changed)
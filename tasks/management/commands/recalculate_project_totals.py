@@ -0,0 +1,32 @@
+from django.core.management.base import BaseCommand, CommandError
+from tasks.models import Project
+from tasks.project_totals import find_mismatches, recalculate_totals
+
+
+class Command(BaseCommand):
+    help = 'Recalculate stored task counts and work left totals of projects from their tasks'
+
+    def add_arguments(self, parser):
+        parser.add_argument('projects', nargs='*', help='Names of projects. All projects if not given')
+        parser.add_argument('--verify', action='store_true',
+                            help='Only check that stored totals are correct, do not change anything')
+
+    def handle(self, *args, **options):
+        projects = None
+        if options['projects']:
+            projects = list(Project.objects.filter(name__in=options['projects']).values_list('id', flat=True))
+            if len(projects) != len(set(options['projects'])):
+                raise CommandError('Unknown project in: %s' % ' '.join(options['projects']))
+
+        mismatches = find_mismatches(projects)
+        names = Project.objects.filter(pk__in=mismatches).values_list('name', flat=True)
+        for name in names:
+            self.stdout.write('Totals out of date: %s' % name)
+        if options['verify']:
+            if mismatches:
+                raise CommandError('Totals out of date in %d project(s)' % len(mismatches))
+            self.stdout.write('Totals are up to date')
+            return
+
+        project_ids = recalculate_totals(projects)
+        self.stdout.write('Recalculated totals of %d project(s)' % len(project_ids))
@@ -0,0 +1,24 @@
+import datetime
+from django.core.management.base import BaseCommand, CommandError
+from tasks.weekly_report import save_snapshot, snapshot_dir, week_label
+
+
+class Command(BaseCommand):
+    help = 'Save weekly reports of all projects and of each project as static files without changing tasks'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--date', help='Date in the week of the snapshot as YYYY-MM-DD. Today if not given')
+        parser.add_argument('--force', action='store_true', help='Replace snapshot of the week if it exists')
+
+    def handle(self, *args, **options):
+        today = datetime.date.today()
+        if options['date']:
+            try:
+                today = datetime.datetime.strptime(options['date'], '%Y-%m-%d').date()
+            except ValueError:
+                raise CommandError('Invalid date: %s' % options['date'])
+        week = save_snapshot(today, options['force'])
+        if week is None:
+            self.stdout.write('Snapshot of week %s already exists' % week_label(today))
+            return
+        self.stdout.write('Saved weekly reports to %s' % snapshot_dir(week))
@@ -0,0 +1,27 @@
+import datetime
+from django.core.management.base import BaseCommand, CommandError
+from tasks.weekly_report import snapshot_dir, week_label, weekly_rollover
+
+
+class Command(BaseCommand):
+    help = ('Save snapshot of weekly reports, then move finished tasks to done and continuing tasks to ongoing. '
+            'Does nothing if the week has already been rolled over, so it can be run from cron repeatedly')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--date', help='Date in the week to roll over as YYYY-MM-DD. Today if not given')
+        parser.add_argument('--force', action='store_true', help='Roll over even if week has been rolled over')
+
+    def handle(self, *args, **options):
+        today = datetime.date.today()
+        if options['date']:
+            try:
+                today = datetime.datetime.strptime(options['date'], '%Y-%m-%d').date()
+            except ValueError:
+                raise CommandError('Invalid date: %s' % options['date'])
+        week = week_label(today)
+        moved = weekly_rollover(today, options['force'])
+        if moved is None:
+            self.stdout.write('Week %s has already been rolled over' % week)
+            return
+        self.stdout.write('Saved weekly reports to %s' % snapshot_dir(week))
+        self.stdout.write('Moved %d task(s) to done and %d task(s) to ongoing' % (moved['done'], moved['ongoing']))
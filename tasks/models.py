@@ -1,9 +1,36 @@
 import datetime
-from django.db import models
+import uuid
+from django.core.cache import caches
+from django.db import models, transaction
+from django.db.models import functions
 from django.urls import reverse
+from django.utils import timezone
+from django.utils.functional import cached_property
 from django.utils.translation import ugettext_lazy
 from django.contrib.auth.models import User
-from .calculate_finish_date import calculate_finish_date
+from .calculate_finish_date import calculate_finish_date, working_days, work_days_string
+from .forecast import project_forecast
+from .schedule import Schedule
+
+# Tasks in these phases are not part of the schedule
+FINISHED_PHASE_NAMES = ['finished', 'done', 'impediment']
+# Denormalized fields of Project
+DENORMALIZED_FIELD_NAMES = ['task_count', 'work_left_total', 'version']
+# Phase tasks can be moved to: (phases they can be moved from, whether remaining work is cleared)
+PHASE_TRANSITIONS = {
+    'ongoing': (['pending', 'continuing'], False),
+    'continuing': (['ongoing'], False),
+    'finished': (['ongoing', 'continuing'], True),
+    'done': (['finished'], True),
+}
+
+
+class ProjectQuerySet(models.QuerySet):
+    def with_task_totals(self):
+        """ Task count and work left calculated from the tasks in the same query. For checking stored totals, not for lists """
+        return self.select_related('created_by').annotate(
+            annotated_task_count=models.Count('tasks'),
+            annotated_work_left=functions.Coalesce(models.Sum('tasks__work_left'), 0))
 
 
 class Project(models.Model):
@@ -15,33 +42,46 @@ class Project(models.Model):
     created_by = models.ForeignKey(User, related_name='created_projects', on_delete=models.CASCADE)
     edited = models.DateTimeField(auto_now=True)
     edited_by = models.ForeignKey(User, null=True, related_name='edited_projects', on_delete=models.CASCADE)
+    # Totals of tasks. Maintained by signal handlers in project_totals.py, not by Project.save
+    task_count = models.PositiveIntegerField(default=0, editable=False)
+    work_left_total = models.PositiveIntegerField(default=0, editable=False)
+    # Incremented whenever project or its tasks change. Used in cache keys
+    version = models.PositiveIntegerField(default=0, editable=False)
+
+    objects = ProjectQuerySet.as_manager()
+
+    # Set by ProjectQuerySet.with_task_totals
+    annotated_task_count = None
+    annotated_work_left = None
+
+    def save(self, *args, **kwargs):
+        if not self._state.adding and not kwargs.get('update_fields') and not kwargs.get('force_insert'):
+            # Do not overwrite totals that may have been updated after this object was loaded
+            kwargs['update_fields'] = [field.name for field in self._meta.concrete_fields
+                                       if not field.primary_key and field.name not in DENORMALIZED_FIELD_NAMES]
+        super(Project, self).save(*args, **kwargs)
 
     @property
-    def total_work_left(self):
-        if self.tasks.count() == 0:
-            return 0
+    def cache_version(self):
+        """ Changes whenever project or its tasks change. Creation time tells apart projects with reused ids """
+        return '%d.%d.%d' % (self.pk, self.version, self.created.timestamp() * 1000000)
 
-        sum_dict = self.tasks.aggregate(models.Sum('work_left'))
-        return sum_dict['work_left__sum']
+    @property
+    def total_task_count(self):
+        if self.annotated_task_count is not None:
+            return self.annotated_task_count
+        return self.task_count
+
+    @property
+    def total_work_left(self):
+        if self.annotated_work_left is not None:
+            return self.annotated_work_left
+        return self.work_left_total
 
     @property
     def total_work_left_list(self):
-        day_list = []
-        total_work = self.total_work_left
-        if total_work == 0:
-            return day_list
-
-        day = datetime.date.today()
-        one_day = datetime.timedelta(days=1)
-        for i in range(0, self.total_work_left):
-            day_list.append(day)
-            day += one_day
-            if day.weekday() == 5:
-                day += one_day
-            if day.weekday() == 6:
-                day += one_day
-
-        return day_list
+        """ Working days needed to finish all tasks, starting from today. For chart headers """
+        return working_days(datetime.date.today(), self.total_work_left)
 
     @property
     def total_work_left_weeks_list(self):
@@ -49,17 +89,7 @@ class Project(models.Model):
 
     @property
     def total_work_left_string(self):
-        days = self.total_work_left
-        weeks = int(days / 5)
-        days = days % 5
-        months = int(weeks / 4)
-        weeks = weeks % 4
-        if months > 0:
-            return '%d month(s), %d week(s), %d day(s)' % (months, weeks, days)
-        elif weeks > 0:
-            return '%d week(s), %d day(s)' % (weeks, days)
-        else:
-            return '%d day(s)' % days
+        return work_days_string(self.total_work_left)
 
     @property
     def finish_date(self):
@@ -67,70 +97,91 @@ class Project(models.Model):
         start_date = datetime.date.today()
         return calculate_finish_date(start_date, days_left)
 
+    def build_schedule(self, start_date=None):
+        """ Schedule of unfinished tasks. Fetches all the tasks in one query """
+        return Schedule(self.tasks_unfinished, start_date)
+
+    @cached_property
+    def schedule(self):
+        """ Schedule starting today """
+        return self.build_schedule()
+
+    @cached_property
+    def forecast(self):
+        """ Start and finish dates of unfinished tasks when owners work in parallel. Cached per version """
+        return project_forecast(self)
+
+    def clear_cached_properties(self):
+        """ Task lists and schedule are computed once per object. Called when tasks of this project change """
+        for name, value in vars(Project).items():
+            if isinstance(value, cached_property):
+                self.__dict__.pop(name, None)
+
+    def refresh_from_db(self, *args, **kwargs):
+        super(Project, self).refresh_from_db(*args, **kwargs)
+        self.clear_cached_properties()
+
     def can_edit(self, user):
         if user == self.created_by:
             return True
         return False
 
     def tasks_by_phase(self, phase):
-        return Task.objects.filter(project=self, phase=phase).order_by('order')
+        return Task.objects.filter(project=self, phase=phase).order_by('order').with_related()
 
     def tasks_by_phase_name(self, phase_name):
-        phases = Phase.objects.filter(name=phase_name)
-        if phases.count() == 1:
-            phase = phases.first()
+        phase = Phase.objects.get_cached(phase_name)
+        if phase:
             return self.tasks_by_phase(phase)
         return Task.objects.none()
 
-    @property
+    @cached_property
     def tasks_done(self):
         return self.tasks_by_phase_name('done')
 
-    @property
+    @cached_property
     def tasks_finished(self):
         return self.tasks_by_phase_name('finished')
 
-    @property
+    @cached_property
     def tasks_ongoing(self):
         return self.tasks_by_phase_name('ongoing')
 
-    @property
+    @cached_property
     def tasks_continuing(self):
         return self.tasks_by_phase_name('continuing')
 
-    @property
+    @cached_property
     def tasks_pending(self):
         return self.tasks_by_phase_name('pending')
 
-    @property
+    @cached_property
     def impediments(self):
         return self.tasks_by_phase_name('impediment')
 
-    @property
-    def tasks_unfinished(self):
-        excluded_phases = ['finished', 'done', 'impediment']
-        tasks = Task.objects.filter(project=self)
-        for phase_name in excluded_phases:
-            tasks = tasks.exclude(phase__name=phase_name)
+    def tasks_in_phases(self, phase_names):
+        """ Tasks in any of given phases. Filtered by cached phase ids, so that (project, phase) index is used """
+        return Task.objects.filter(project=self, phase__in=Phase.objects.get_cached_list(phase_names))
 
-        return tasks
+    @cached_property
+    def tasks_unfinished(self):
+        return Task.objects.filter(project=self).in_schedule().with_cumulative_work().with_related()
 
-    @property
+    @cached_property
     def tasks_not_done(self):
-        done = Phase.objects.get(name='done')
-        return Task.objects.filter(project=self).exclude(phase=done)
+        tasks = Task.objects.filter(project=self)
+        done = Phase.objects.get_cached('done')
+        if done:
+            tasks = tasks.exclude(phase=done)
+        return tasks.with_cumulative_work().with_related()
 
-    @property
+    @cached_property
     def tasks_last_week(self):
-        finished_or_continuing = models.Q(phase__name='finished') | models.Q(phase__name='continuing')
-        tasks = Task.objects.filter(project=self).filter(finished_or_continuing)
-        return tasks
+        return self.tasks_in_phases(['finished', 'continuing']).with_related()
 
-    @property
+    @cached_property
     def tasks_this_week(self):
-        ongoing_or_continuing = models.Q(phase__name='ongoing') | models.Q(phase__name='continuing')
-        tasks = Task.objects.filter(project=self).filter(ongoing_or_continuing)
-        return tasks
+        return self.tasks_in_phases(['ongoing', 'continuing']).with_related()
 
     def __str__(self):
         return self.name
@@ -156,6 +207,70 @@ class TaskStatus(models.Model):
     order = models.PositiveSmallIntegerField(default=0)
 
 
+class PhaseManager(models.Manager):
+    """
+    Phases are reference data that rarely change. All of them are loaded once per process
+    and served from memory. Cache is cleared by signal handlers when phases are saved or deleted.
+    Version stamp in the shared cache tells other worker processes to reload too. It is read
+    only on first use after check_version, which is called when a request starts
+    """
+    cache_alias = 'shared'
+    version_key = 'tasks:phases_version'
+
+    def __init__(self):
+        super(PhaseManager, self).__init__()
+        self._loaded = {}
+        self._version_unchecked = True
+
+    def check_version(self):
+        """ Read version stamp again on next use, in case another process has changed phases """
+        self._version_unchecked = True
+
+    def _phases(self):
+        loaded = self._loaded
+        if loaded and not self._version_unchecked:
+            return loaded
+        self._version_unchecked = False
+        shared_cache = caches[self.cache_alias]
+        version = shared_cache.get(self.version_key)
+        if version is None:
+            version = uuid.uuid4().hex
+            shared_cache.set(self.version_key, version, None)
+        loaded = self._loaded
+        if loaded.get('version') != version:
+            phases = list(self.get_queryset().order_by('order', 'title'))
+            # Replaced, not modified, so that other threads never see it half updated
+            loaded = {'version': version, 'phases': phases, 'by_name': dict((phase.name, phase) for phase in phases)}
+            self._loaded = loaded
+        return loaded
+
+    def get_cached(self, name):
+        """ Phase with given name or None """
+        return self._phases()['by_name'].get(name)
+
+    def get_cached_list(self, names):
+        """ Phases with given names. Names of phases that do not exist are skipped """
+        by_name = self._phases()['by_name']
+        return [by_name[name] for name in names if name in by_name]
+
+    def cached(self):
+        """ All phases in order """
+        return self._phases()['phases']
+
+    def initial(self):
+        """ Phase of new tasks: first in order. None if there are no phases """
+        phases = self.cached()
+        return phases[0] if phases else None
+
+    def version(self):
+        """ Changes whenever phases change """
+        return self._phases()['version']
+
+    def clear_cache(self):
+        self._loaded = {}
+        caches[self.cache_alias].delete(self.version_key)
+
+
 class Phase(models.Model):
     # Blocked, Pending, Ongoing, (Recently)Finished, Done
     name = models.SlugField(max_length=100, unique=True, verbose_name=ugettext_lazy('name'),
@@ -165,6 +280,8 @@ class Phase(models.Model):
     order = models.PositiveSmallIntegerField(default=0)
     element_class = models.CharField(default='', blank=True, max_length=250)  # CSS class to be used in HTML
 
+    objects = PhaseManager()
+
     def __str__(self):
         # return '%d:%s:%s' % (self.order, self.name, self.title)
         return self.title
@@ -173,13 +290,86 @@ class Phase(models.Model):
         ordering = ['order', 'title']
 
 
+class ProjectPhaseTotal(models.Model):
+    """ Number of tasks and work left in them per phase in a project. Maintained like Project totals """
+    project = models.ForeignKey(Project, related_name='phase_totals', on_delete=models.CASCADE)
+    phase = models.ForeignKey(Phase, null=True, on_delete=models.CASCADE)
+    task_count = models.PositiveIntegerField(default=0)
+    work_left = models.PositiveIntegerField(default=0)
+
+    def __str__(self):
+        return '%s:%s' % (self.project.name, self.phase.name if self.phase else '-')
+
+    class Meta:
+        unique_together = ['project', 'phase']
+
+
+class TaskQuerySet(models.QuerySet):
+    def with_related(self):
+        """ Fetch related objects used in templates and Task.can_edit in the same query """
+        return self.select_related('phase', 'owner', 'priority', 'created_by', 'project__created_by')
+
+    def in_schedule(self):
+        """ Tasks that are part of the schedule: not in any of FINISHED_PHASE_NAMES """
+        return self.exclude(phase__in=Phase.objects.get_cached_list(FINISHED_PHASE_NAMES))
+
+    def with_cumulative_work(self):
+        """
+        Annotate tasks with window sums of work left in scheduled tasks of the same project: up to and including
+        the order of the task, and in tasks with the same order. Tasks in FINISHED_PHASE_NAMES add nothing, so
+        any queryset that keeps all the scheduled tasks of a project gives the same sums as a query for each task.
+        Task.cumulative_work_before is then known without further queries.
+        """
+        scheduled_work = models.Case(
+            models.When(phase__in=Phase.objects.get_cached_list(FINISHED_PHASE_NAMES), then=models.Value(0)),
+            default=models.F('work_left'), output_field=models.IntegerField())
+        return self.annotate(
+            work_up_to_order=models.Window(expression=models.Sum(scheduled_work),
+                                           partition_by=[models.F('project_id')],
+                                           order_by=models.F('order').asc()),
+            work_in_same_order=models.Window(expression=models.Sum(scheduled_work),
+                                             partition_by=[models.F('project_id'), models.F('order')]))
+
+    def transition_to(self, phase_name):
+        """
+        Move tasks to phase if PHASE_TRANSITIONS allows it, with one UPDATE.
+        Returns {task_id: phase_name if task was moved, otherwise reason why not}
+        """
+        from .project_totals import recalculate_totals
+        phase = Phase.objects.get_cached(phase_name)
+        if phase_name not in PHASE_TRANSITIONS or not phase:
+            raise ValueError('Tasks can not be moved to phase: %s' % phase_name)
+        source_names, clear_work_left = PHASE_TRANSITIONS[phase_name]
+        results = {}
+        moved = []
+        project_ids = set()
+        for task_id, project_id, current in self.order_by().values_list('id', 'project_id', 'phase__name'):
+            if current in source_names:
+                results[task_id] = phase_name
+                moved.append(task_id)
+                project_ids.add(project_id)
+            else:
+                results[task_id] = 'Can not move from %s to %s' % (current, phase_name)
+        if moved:
+            values = {'phase': phase, 'edited': timezone.now()}
+            if clear_work_left:
+                values['work_left'] = 0
+            sources = [Phase.objects.get_cached(name) for name in source_names]
+            with transaction.atomic():
+                # Phase is checked again in case it has changed after it was read
+                Task.objects.filter(pk__in=moved, phase__in=[source for source in sources if source]).update(**values)
+                # Update does not send signals that keep totals up to date
+                recalculate_totals(project_ids)
+        return results
+
+
 class Task(models.Model):
     project = models.ForeignKey(Project, null=False, related_name='tasks', on_delete=models.CASCADE)
-    name = models.SlugField(max_length=100, unique=True, verbose_name=ugettext_lazy('name'),
-                            help_text=ugettext_lazy('Must be unique. Used in URL.'))
+    name = models.SlugField(max_length=100, verbose_name=ugettext_lazy('name'),
+                            help_text=ugettext_lazy('Must be unique in project. Used in URL.'))
     title = models.CharField(max_length=250, verbose_name=ugettext_lazy('task'))
     description = models.TextField(null=True, blank=True, verbose_name=ugettext_lazy('description'))
-    order = models.PositiveSmallIntegerField(default=0)
+    order = models.PositiveIntegerField(default=0)
     priority = models.ForeignKey(Priority, null=True, on_delete=models.CASCADE)
     phase = models.ForeignKey(Phase, null=True, blank=True, on_delete=models.CASCADE)
     # status = models.ForeignKey(TaskStatus, null=True)
@@ -191,6 +381,17 @@ class Task(models.Model):
     edited = models.DateTimeField(auto_now=True)
     edited_by = models.ForeignKey(User, null=True, related_name='edited_tasks', on_delete=models.CASCADE)
 
+    objects = TaskQuerySet.as_manager()
+
+    # Set by TaskQuerySet.with_cumulative_work
+    work_up_to_order = None
+    work_in_same_order = None
+
+    def save(self, *args, **kwargs):
+        # Totals of project are updated by post_save signal handler in the same transaction
+        with transaction.atomic(savepoint=False):
+            super(Task, self).save(*args, **kwargs)
+
     @property
     def work_left_list(self):
         """ List with as many items as days of work left. For looping in templates """
@@ -201,8 +402,16 @@ class Task(models.Model):
 
     @property
     def cumulative_work_before(self):
-        """ How many days of work in tasks before this one """
-        preceding_tasks = Task.objects.filter(project=self.project, order__lt=self.order)
+        """
+        How many days of work in scheduled tasks before this one, as in Project.schedule.
+        Already known if fetched with_cumulative_work
+        """
+        if self.work_up_to_order is not None:
+            return self.work_up_to_order - self.work_in_same_order
+
+        # Tasks without work left do not add to the sum. Leaving them out lets the partial index be used
+        preceding_tasks = Task.objects.filter(project=self.project, order__lt=self.order, work_left__gt=0)
+        preceding_tasks = preceding_tasks.in_schedule()
         if preceding_tasks.count() == 0:
             return 0
 
@@ -275,33 +484,37 @@ class Task(models.Model):
         return False
 
     def set_phase(self, phase_name):
-        phases = Phase.objects.filter(name=phase_name)
-        if phases.count() == 1:
-            self.phase = phases.first()
+        phase = Phase.objects.get_cached(phase_name)
+        if phase:
+            self.phase = phase
             self.save()
 
-    def switch_with(self, task):
-        old_order = self.order
-        self.order = task.order
-        task.order = old_order
-        task.save()
-        self.save()
-
-    def move_up(self):
-        prev_task = self.prev
-        if not prev_task:
+    def can_transition_to(self, phase_name):
+        """ Whether PHASE_TRANSITIONS allows moving task to phase """
+        if phase_name not in PHASE_TRANSITIONS or not self.phase:
             return False
+        return self.phase.name in PHASE_TRANSITIONS[phase_name][0]
 
-        self.switch_with(prev_task)
+    def transition_to(self, phase_name):
+        """ Move task to phase if PHASE_TRANSITIONS allows it. Returns whether task was moved """
+        if not self.can_transition_to(phase_name):
+            return False
+        if PHASE_TRANSITIONS[phase_name][1]:
+            self.work_left = 0
+        self.set_phase(phase_name)
         return True
 
+    def move_up(self):
+        from .task_order import move_by
+        return move_by(self, -1)
+
     def move_down(self):
-        next_task = self.next
-        if not next_task:
-            return False
+        from .task_order import move_by
+        return move_by(self, 1)
 
-        self.switch_with(next_task)
-        return True
+    def move_to(self, position):
+        from .task_order import move_to
+        return move_to(self, position)
 
     def __str__(self):
         return '%s:%s' % (self.project.name, self.name)
@@ -314,3 +527,16 @@ class Task(models.Model):
 
     class Meta:
         ordering = ['order', 'title']
+        # Tasks are identified by project and name in URLs. Also indexes the lookup
+        unique_together = ['project', 'name']
+        indexes = [
+            # Tasks of project in order: schedules, charts and moving tasks
+            models.Index(fields=['project', 'order'], name='task_project_order_idx'),
+            # Tasks of project in a phase in order: weekly reports and project tabs
+            models.Index(fields=['project', 'phase', 'order'], name='task_project_phase_order_idx'),
+            # Pages of all tasks, sought by ordering of TaskList
+            models.Index(fields=['order', 'title', 'id'], name='task_order_title_idx'),
+            # Tasks with work left are a small part of a long living project. Ignored if database does not
+            # support partial indexes
+            models.Index(fields=['project', 'order'], name='task_work_left_idx', condition=models.Q(work_left__gt=0)),
+        ]
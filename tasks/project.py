@@ -1,13 +1,62 @@
+import datetime
+import hashlib
+import os
 from django.urls import reverse_lazy
-from django.views.generic import ListView, DetailView
+from django.shortcuts import get_object_or_404
+from django.utils.cache import get_conditional_response, patch_cache_control
+from django.utils.decorators import method_decorator
+from django.utils.http import http_date
+from django.views.decorators.cache import cache_control
+from django.views.decorators.http import condition
+from django.views.generic import ListView, DetailView, TemplateView, View
 from django.views.generic.edit import CreateView, UpdateView, DeleteView
-from django.http import Http404
-from .models import Project
+from django.http import FileResponse, Http404, HttpResponse, StreamingHttpResponse
+from .models import Phase, Project
 from .check_validity import check_validity
+from .chart_svg import render_chart_svg
+from .task_export import FIELDS, FORMATS, PROJECT_FIELDS, export_rows, project_rows
+from .weekly_report import snapshot_path, snapshot_project_names, snapshot_weeks
 
 
+def _page_state(request, slug=None):
+    """ Versions of one or all projects, read with one query once per request """
+    if not hasattr(request, '_page_state'):
+        projects = Project.objects.all()
+        if slug is not None:
+            projects = projects.filter(name=slug)
+        request._page_state = list(projects.order_by('id').values_list('id', 'version', 'created'))
+    return request._page_state
+
+
+def report_etag(request, slug=None, **kwargs):
+    """ Reports change with projects and tasks, daily because of dates, and show phase messages too """
+    rows = _page_state(request, slug)
+    if slug is not None and not rows:
+        return None
+    state = [(project_id, version, created.timestamp()) for project_id, version, created in rows]
+    state += [datetime.date.today().isoformat(), Phase.objects.version()]
+    return hashlib.md5(repr(state).encode()).hexdigest()
+
+
+def page_etag(request, slug=None, **kwargs):
+    """ Pages depend on user too """
+    etag = report_etag(request, slug)
+    if etag is None:
+        return None
+    return '%s-%s' % (etag, request.user.pk)
+
+
+# Pages are checked on every request, but not rendered again unless they have changed.
+# Only ETag is given: deleting or reordering tasks, changing phases and logging in do not show in any
+# edited time, so Last-Modified would let clients keep stale pages
+conditional_page = [cache_control(private=True, no_cache=True), condition(etag_func=page_etag)]
+conditional_report = [cache_control(no_cache=True), condition(etag_func=report_etag)]
+
+
+@method_decorator(conditional_page, name='get')
 class ProjectList(ListView):
     model = Project
+    queryset = Project.objects.select_related('created_by')
 
     def get_context_data(self, **kwargs):
         context = super(ProjectList, self).get_context_data(**kwargs)
@@ -15,20 +64,34 @@ class ProjectList(ListView):
         return context
 
 
+def flag(request, name):
+    """
+    '1' if parameter is given with any value, otherwise ''. Flags are part of fragment cache keys,
+    so arbitrary values must not create new cache entries
+    """
+    return '1' if request.GET.get(name) else ''
+
+
+@method_decorator(conditional_report, name='get')
 class ProjectListWeekly(ListView):
     model = Project
+    queryset = Project.objects.select_related('created_by')
     template_name = 'tasks/project_list_weekly.html'
 
     def get_context_data(self, **kwargs):
         context = super(ProjectListWeekly, self).get_context_data(**kwargs)
         context['messages'] = check_validity()
-        context['hide_chart'] = self.request.GET.get('hide_chart', '')
-        context['hide_text'] = self.request.GET.get('hide_text', '')
+        context['hide_chart'] = flag(self.request, 'hide_chart')
+        context['hide_text'] = flag(self.request, 'hide_text')
+        context['day_cells'] = flag(self.request, 'day_cells')
+        context['today'] = datetime.date.today()  # Charts start from today, so cached reports are valid for a day
         return context
 
 
+@method_decorator(conditional_page, name='get')
 class ProjectDetail(DetailView):
     model = Project
+    queryset = Project.objects.select_related('created_by')
     slug_field = 'name'
     fields = ['name', 'title', 'description']
     context_object_name = 'project'
@@ -38,9 +101,11 @@ class ProjectDetail(DetailView):
         context['message'] = self.request.GET.get('message', '')
         context['can_edit'] = self.object.can_edit(self.request.user)
         context['tab'] = self.kwargs.get('tab', 'table')
+        context['day_cells'] = flag(self.request, 'day_cells')
         return context
 
 
+@method_decorator(conditional_report, name='get')
 class ProjectWeekly(DetailView):
     model = Project
     slug_field = 'name'
@@ -50,11 +115,89 @@ class ProjectWeekly(DetailView):
 
     def get_context_data(self, **kwargs):
         context = super(ProjectWeekly, self).get_context_data(**kwargs)
-        context['hide_chart'] = self.request.GET.get('hide_chart', '')
-        context['hide_text'] = self.request.GET.get('hide_text', '')
+        context['hide_chart'] = flag(self.request, 'hide_chart')
+        context['hide_text'] = flag(self.request, 'hide_text')
+        context['day_cells'] = flag(self.request, 'day_cells')
+        context['today'] = datetime.date.today()
+        return context
+
+
+def project_chart_etag(request, slug):
+    """ Chart changes when project or its tasks change, and daily because it starts from today """
+    project = Project.objects.filter(name=slug).only('id', 'version', 'created').first()
+    if project:
+        return '%s-%s' % (project.cache_version, datetime.date.today().isoformat())
+    return None
+
+
+class ProjectChartSvg(DetailView):
+    model = Project
+    slug_field = 'name'
+
+    @method_decorator(condition(etag_func=project_chart_etag))
+    def get(self, request, *args, **kwargs):
+        return super(ProjectChartSvg, self).get(request, *args, **kwargs)
+
+    def render_to_response(self, context, **response_kwargs):
+        return HttpResponse(render_chart_svg(self.object.schedule), content_type='image/svg+xml')
+
+
+def export_response(rows, file_format, filename, fields=FIELDS):
+    """ Rows streamed to client while they are read from database """
+    lines, content_type = FORMATS[file_format]
+    response = StreamingHttpResponse(lines(rows, fields), content_type=content_type)
+    response['Content-Disposition'] = 'attachment; filename="%s.%s"' % (filename, file_format)
+    return response
+
+
+class ProjectExport(View):
+    def get(self, request, *args, **kwargs):
+        project = get_object_or_404(Project, name=kwargs['slug'])
+        return export_response(export_rows(project.tasks.all()), kwargs['format'], project.name)
+
+
+class ProjectListExport(View):
+    """ Tasks of all projects """
+    def get(self, request, *args, **kwargs):
+        return export_response(export_rows(), kwargs['format'], 'projects')
+
+
+class ProjectListExportProjects(View):
+    """ Projects themselves, one row each """
+    def get(self, request, *args, **kwargs):
+        return export_response(project_rows(), kwargs['format'], 'project_list', PROJECT_FIELDS)
+
+
+class WeeklyHistory(TemplateView):
+    template_name = 'tasks/weekly_history.html'
+
+    def get_context_data(self, **kwargs):
+        context = super(WeeklyHistory, self).get_context_data(**kwargs)
+        context['weeks'] = [(week, snapshot_project_names(week)) for week in snapshot_weeks()]
         return context
 
 
+class WeeklySnapshot(View):
+    """
+    Saved weekly report. Snapshot of a week is replaced at the same URL when week is rolled over or
+    snapshot is forced, so clients must revalidate. Revalidation only needs the size and time of the file
+    """
+    def get(self, request, *args, **kwargs):
+        path = snapshot_path(kwargs['week'], kwargs.get('name'))
+        if not os.path.isfile(path):
+            raise Http404
+        stat = os.stat(path)
+        # Nanosecond modification time tells apart snapshots saved within the same second
+        etag = '"%x-%x"' % (stat.st_mtime_ns, stat.st_size)
+        response = get_conditional_response(request, etag=etag, last_modified=int(stat.st_mtime))
+        if response is None:
+            response = FileResponse(open(path, 'rb'), content_type='text/html; charset=utf-8')
+        response['ETag'] = etag
+        response['Last-Modified'] = http_date(stat.st_mtime)
+        patch_cache_control(response, public=True, no_cache=True)
+        return response
+
+
 class ProjectCreate(CreateView):
     model = Project
     slug_field = 'name'
@@ -0,0 +1,111 @@
+from django.db import IntegrityError, models, transaction
+from django.db.models.functions import Greatest
+from .models import Project, ProjectPhaseTotal, Task
+
+
+def increment_version(project):
+    """ Mark project changed """
+    project_id = project if isinstance(project, int) else project.pk
+    Project.objects.filter(pk=project_id).update(version=models.F('version') + 1)
+    if isinstance(project, Project):
+        project.version += 1
+
+
+def _added(field_name, value):
+    # Totals that are out of date are never made negative. recalculate_totals corrects them
+    return Greatest(models.F(field_name) + value, 0)
+
+
+def add_to_totals(project, phase_id, task_count, work_left):
+    """
+    Add task count and work left to stored totals of project and its phase. Increments version too.
+    Joins the transaction of the task save or delete that called it
+    """
+    project_id = project if isinstance(project, int) else project.pk
+    with transaction.atomic(savepoint=False):
+        Project.objects.filter(pk=project_id).update(
+            task_count=_added('task_count', task_count),
+            work_left_total=_added('work_left_total', work_left),
+            version=models.F('version') + 1)
+        updated = ProjectPhaseTotal.objects.filter(project_id=project_id, phase_id=phase_id).update(
+            task_count=_added('task_count', task_count),
+            work_left=_added('work_left', work_left))
+        if not updated and task_count > 0:
+            # Nothing to subtract from if phase total has already been deleted with its project or phase
+            try:
+                with transaction.atomic():
+                    ProjectPhaseTotal.objects.create(project_id=project_id, phase_id=phase_id,
+                                                     task_count=task_count, work_left=work_left)
+            except IntegrityError:
+                # Created by a concurrent save after the update above
+                ProjectPhaseTotal.objects.filter(project_id=project_id, phase_id=phase_id).update(
+                    task_count=_added('task_count', task_count),
+                    work_left=_added('work_left', work_left))
+    if isinstance(project, Project):
+        # Keep object in memory up to date too
+        project.task_count = max(project.task_count + task_count, 0)
+        project.work_left_total = max(project.work_left_total + work_left, 0)
+        project.version += 1
+
+
+def calculate_totals(projects=None):
+    """
+    Totals calculated from tasks with one grouped query.
+    Returns {project_id: (task_count, work_left, {phase_id: (task_count, work_left)})}
+    """
+    tasks = Task.objects.all()
+    if projects is not None:
+        tasks = tasks.filter(project__in=projects)
+    rows = tasks.order_by().values('project_id', 'phase_id').annotate(
+        count=models.Count('id'), work_left=models.Sum('work_left'))
+    totals = {}
+    for row in rows:
+        task_count, work_left, phases = totals.get(row['project_id'], (0, 0, {}))
+        phases[row['phase_id']] = (row['count'], row['work_left'])
+        totals[row['project_id']] = (task_count + row['count'], work_left + row['work_left'], phases)
+    return totals
+
+
+def stored_totals(projects=None):
+    """ Totals as currently stored. Same format as calculate_totals, projects without tasks included """
+    project_rows = Project.objects.all()
+    phase_rows = ProjectPhaseTotal.objects.exclude(task_count=0, work_left=0)
+    if projects is not None:
+        project_rows = project_rows.filter(pk__in=projects)
+        phase_rows = phase_rows.filter(project__in=projects)
+    totals = {}
+    for project_id, task_count, work_left in project_rows.values_list('id', 'task_count', 'work_left_total'):
+        totals[project_id] = (task_count, work_left, {})
+    for project_id, phase_id, task_count, work_left in phase_rows.values_list(
+            'project_id', 'phase_id', 'task_count', 'work_left'):
+        totals[project_id][2][phase_id] = (task_count, work_left)
+    return totals
+
+
+def find_mismatches(projects=None):
+    """ Ids of projects whose stored totals differ from totals calculated from tasks """
+    calculated = calculate_totals(projects)
+    stored = stored_totals(projects)
+    return sorted(project_id for project_id, totals in stored.items()
+                  if totals != calculated.get(project_id, (0, 0, {})))
+
+
+def recalculate_totals(projects=None):
+    """ Replace stored totals with totals calculated from tasks """
+    with transaction.atomic():
+        project_rows = Project.objects.select_for_update()
+        if projects is not None:
+            project_rows = project_rows.filter(pk__in=projects)
+        project_ids = list(project_rows.values_list('id', flat=True))
+        calculated = calculate_totals(project_ids)
+        ProjectPhaseTotal.objects.filter(project__in=project_ids).delete()
+        phase_totals = []
+        for project_id in project_ids:
+            task_count, work_left, phases = calculated.get(project_id, (0, 0, {}))
+            Project.objects.filter(pk=project_id).update(task_count=task_count, work_left_total=work_left,
+                                                         version=models.F('version') + 1)
+            for phase_id, (phase_task_count, phase_work_left) in phases.items():
+                phase_totals.append(ProjectPhaseTotal(project_id=project_id, phase_id=phase_id,
+                                                      task_count=phase_task_count, work_left=phase_work_left))
+        ProjectPhaseTotal.objects.bulk_create(phase_totals)
+    return project_ids
@@ -0,0 +1,67 @@
+import datetime
+from .calculate_finish_date import calculate_finish_date, calculate_finish_dates, working_days, work_days_string
+
+
+class ScheduleRow(object):
+    """ Task with its position in project schedule. For rendering charts """
+    def __init__(self, task, cumulative_work_before, start_date, finish_date):
+        self.task = task
+        self.work_left = task.work_left
+        self.cumulative_work_before = cumulative_work_before
+        self.cumulative_work_left = cumulative_work_before + task.work_left
+        self.start_date = start_date
+        self.finish_date = finish_date
+
+    @property
+    def cumulative_work_before_list(self):
+        """ List with as many items as days of work before this task. For looping in templates """
+        return range(0, self.cumulative_work_before)
+
+    @property
+    def work_left_list(self):
+        """ List with as many items as days of work left. For looping in templates """
+        return range(0, self.work_left)
+
+
+class Schedule(object):
+    """
+    Schedule of tasks done one after another in given order.
+    Prefix sums and dates of all tasks are calculated in one pass over already fetched tasks.
+    """
+    def __init__(self, tasks, start_date=None):
+        if start_date is None:
+            start_date = datetime.date.today()
+        self.start_date = start_date
+        tasks = list(tasks)
+        work_before = []
+        total = 0
+        group_order = None
+        group_start = 0
+        for task in tasks:
+            # Tasks with same order do not wait for each other
+            if task.order != group_order:
+                group_order = task.order
+                group_start = total
+            work_before.append(group_start)
+            total += task.work_left
+
+        offsets = work_before + [before + task.work_left for before, task in zip(work_before, tasks)]
+        dates = calculate_finish_dates(start_date, offsets)
+        start_dates = dates[:len(tasks)]
+        finish_dates = dates[len(tasks):]
+        self.rows = [ScheduleRow(task, before, start, finish)
+                     for task, before, start, finish in zip(tasks, work_before, start_dates, finish_dates)]
+        self.total_work_left = total
+
+    @property
+    def finish_date(self):
+        return calculate_finish_date(self.start_date, self.total_work_left)
+
+    @property
+    def days(self):
+        """ Working days of the whole schedule. For chart headers """
+        return working_days(self.start_date, self.total_work_left)
+
+    @property
+    def total_work_left_string(self):
+        return work_days_string(self.total_work_left)
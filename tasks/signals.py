@@ -0,0 +1,92 @@
+from django.core.signals import request_started
+from django.db import connections
+from django.db.models.signals import post_init, post_migrate, post_save, post_delete
+from django.dispatch import receiver
+from .models import Phase, Project, Task
+from .project_totals import add_to_totals, find_mismatches, increment_version, recalculate_totals
+
+
+def _saved_state(task):
+    # Read from __dict__ so that deferred fields are not loaded
+    values = task.__dict__
+    return values.get('project_id'), values.get('phase_id'), values.get('work_left')
+
+
+def _project(task, project_id):
+    # Project object is updated too if it is already loaded, but it is not fetched just for that
+    if project_id == task.project_id and Task.project.is_cached(task):
+        return task.project
+    return project_id
+
+
+@receiver(post_init, sender=Task)
+def remember_task_state(sender, instance, **kwargs):
+    instance._saved_state = _saved_state(instance) if instance.pk else None
+
+
+@receiver(post_save, sender=Task)
+def update_project_totals_on_save(sender, instance, created, raw=False, **kwargs):
+    if raw:
+        return
+    old_state = None if created else instance._saved_state
+    new_state = _saved_state(instance)
+    instance._saved_state = new_state
+    if old_state == new_state:
+        increment_version(_project(instance, instance.project_id))
+        return
+
+    project_id, phase_id, work_left = new_state
+    if work_left is None:
+        # Deferred and therefore not changed
+        work_left = Task.objects.filter(pk=instance.pk).values_list('work_left', flat=True).get()
+    if old_state:
+        old_project_id, old_phase_id, old_work_left = old_state
+        if old_work_left is None:
+            old_work_left = work_left
+        add_to_totals(_project(instance, old_project_id), old_phase_id, -1, -old_work_left)
+    add_to_totals(_project(instance, project_id), phase_id, 1, work_left)
+
+
+@receiver(post_delete, sender=Task)
+def update_project_totals_on_delete(sender, instance, **kwargs):
+    project_id, phase_id, work_left = instance._saved_state or _saved_state(instance)
+    if work_left is None:
+        work_left = instance.work_left
+    add_to_totals(_project(instance, project_id), phase_id, -1, -work_left)
+
+
+@receiver(post_save, sender=Task)
+@receiver(post_delete, sender=Task)
+def clear_project_cached_properties(sender, instance, raw=False, **kwargs):
+    if not raw and Task.project.is_cached(instance):
+        instance.project.clear_cached_properties()
+
+
+@receiver(post_save, sender=Phase)
+@receiver(post_delete, sender=Phase)
+def clear_phase_cache(sender, **kwargs):
+    Phase.objects.clear_cache()
+
+
+@receiver(request_started)
+def check_phase_version(sender, **kwargs):
+    Phase.objects.check_version()
+
+
+@receiver(post_save, sender=Project)
+def increment_project_version(sender, instance, created, raw=False, **kwargs):
+    if not raw and not created:
+        increment_version(instance)
+
+
+@receiver(post_migrate)
+def fill_project_totals(sender, using='default', **kwargs):
+    """
+    Totals of projects that existed before they were stored start from zero.
+    They are calculated from tasks after migrate, so that they need not be recalculated by hand
+    """
+    if sender.name != 'tasks' or Project._meta.db_table not in connections[using].introspection.table_names():
+        return
+    mismatches = find_mismatches()
+    if mismatches:
+        recalculate_totals(mismatches)
@@ -1,23 +1,46 @@
 import logging
+import os
 from django.urls import reverse, reverse_lazy
 from django.shortcuts import get_object_or_404
 from django.views.generic import ListView, DetailView, View
 from django.views.generic.edit import CreateView, UpdateView, DeleteView
-from django.http import HttpResponseRedirect, Http404
+from django.http import HttpResponseRedirect, HttpResponseBadRequest, Http404, JsonResponse
 from django.utils.text import slugify
 from tasks import models
+from tasks.keyset import KeysetPaginationMixin
+from tasks.task_import import PARSERS, TaskImportError, import_tasks
+from tasks.task_order import append_order, reorder_tasks
 
 
-class TaskList(ListView):
+class TaskList(KeysetPaginationMixin, ListView):
     model = models.Task
+    queryset = models.Task.objects.select_related('project')
+    context_object_name = 'task_list'
+    template_name = 'tasks/task_list.html'
+    keyset = ['order', 'title', 'id']
+    page_url_name = 'tasks:tasks'
+    more_url_name = 'tasks:tasks_more'
 
     def get_context_data(self, **kwargs):
         context = super(TaskList, self).get_context_data(**kwargs)
         return context
 
 
-class TaskDetail(DetailView):
+def get_task_or_404(queryset, kwargs):
+    """ Task of project given in URL. Looked up through (project, name) index, project fetched in the same query """
+    return get_object_or_404(queryset.select_related('project'), project__name=kwargs['project_name'],
+                             name=kwargs['slug'])
+
+
+class ProjectTaskMixin(object):
+    """ Object of a task view is looked up by project and name in URL """
+    def get_object(self, queryset=None):
+        return get_task_or_404(queryset if queryset is not None else self.get_queryset(), self.kwargs)
+
+
+class TaskDetail(ProjectTaskMixin, DetailView):
     model = models.Task
+    queryset = models.Task.objects.with_related()
     slug_field = 'name'
     fields = ['name', 'title', 'description']
     context_object_name = 'task'
@@ -49,16 +72,9 @@ class TaskCreate(CreateView):
             logger.warning("Task already exists: project=%s name=%s" % (self.project.name, form.instance.name))
             return super(TaskCreate, self).form_invalid(form)
 
-        tasks = self.project.tasks.order_by('-order')
-        if tasks.count() > 0:
-            highest_order_task = tasks.first()
-            form.instance.order = highest_order_task.order + 1
-        else:
-            form.instance.order = 0
+        form.instance.order = append_order(self.project)
 
-        phases = models.Phase.objects.all().order_by('order')
-        if phases.count() > 0:
-            form.instance.phase = phases.first()
+        form.instance.phase = models.Phase.objects.initial()
 
         if self.project:
             self.success_url = reverse('tasks:project', args=[self.project.name])
@@ -72,16 +88,15 @@ class TaskCreate(CreateView):
         return context
 
 
-class TaskUpdate(UpdateView):
+class TaskUpdate(ProjectTaskMixin, UpdateView):
     model = models.Task
+    queryset = models.Task.objects.with_related()
     slug_field = 'name'
     fields = ['title', 'description', 'work_left', 'order', 'phase']
 
-    def dispatch(self, request, *args, **kwargs):
-        #logger = logging.getLogger(__name__)
-        self.project = get_object_or_404(models.Project, name=self.kwargs['project_name'])
-        #logger.warning("Registered:%s Creator:%s" % (self.request.user.username, self.blog.created_by.username))
-        return super(TaskUpdate, self).dispatch(request,*args, **kwargs)
+    @property
+    def project(self):
+        return self.object.project
 
     def render_to_response(self, context, **response_kwargs):
         if self.object.can_edit(self.request.user):
@@ -110,21 +125,62 @@ class TaskUpdate(UpdateView):
 
 class TaskMove(View):
     def get(self, request, *args, **kwargs):
-        project = get_object_or_404(models.Project, name=kwargs['project_name'])
-        task = get_object_or_404(models.Task, name=kwargs['slug'])
+        task = get_task_or_404(models.Task.objects.all(), kwargs)
+        project = task.project
         direction = kwargs.get('dir', '')
         if direction == 'up':
             result = task.move_up()
             # return HttpResponse('Moving up: %s' % str(result))
         elif direction == 'down':
             task.move_down()
+        elif direction.isdigit():
+            task.move_to(int(direction))
+        return HttpResponseRedirect(project.get_absolute_url())
+
+
+class TaskReorder(View):
+    """ Set order of all tasks of project at once. Task names are posted in new order as 'tasks' """
+    def post(self, request, *args, **kwargs):
+        project = get_object_or_404(models.Project, name=kwargs['project_name'])
+        if not project.can_edit(request.user):
+            raise Http404
+        names = request.POST.getlist('tasks')
+        task_ids = dict(project.tasks.filter(name__in=names).values_list('name', 'id'))
+        try:
+            reorder_tasks(project, [task_ids.get(name) for name in names])
+        except ValueError as error:
+            return HttpResponseBadRequest(str(error))
         return HttpResponseRedirect(project.get_absolute_url())
 
 
+class TaskImport(View):
+    """
+    Import tasks to the end of project. CSV or JSON lines are posted as file 'file' or as request body.
+    Format is given as 'format' or guessed from file name. Default is CSV
+    """
+    def post(self, request, *args, **kwargs):
+        project = get_object_or_404(models.Project, name=kwargs['project_name'])
+        if not project.can_edit(request.user):
+            raise Http404
+        source = request.FILES.get('file') or request
+        file_format = request.GET.get('format') or request.POST.get('format')
+        if not file_format:
+            file_format = os.path.splitext(getattr(source, 'name', ''))[1].lstrip('.') or 'csv'
+        if file_format not in PARSERS:
+            return HttpResponseBadRequest('Unknown format: %s' % file_format)
+
+        lines = (line.decode('utf-8') for line in source)
+        try:
+            count = import_tasks(project, PARSERS[file_format](lines), request.user)
+        except (TaskImportError, UnicodeDecodeError) as error:
+            return HttpResponseBadRequest('Nothing imported. %s' % error)
+        return JsonResponse({'imported': count})
+
+
 class TaskSetPhaseTo(View):
     def get(self, request, *args, **kwargs):
-        project = get_object_or_404(models.Project, name=kwargs['project_name'])
-        task = get_object_or_404(models.Task, name=kwargs['slug'])
+        task = get_task_or_404(models.Task.objects.select_related('phase'), kwargs)
+        project = task.project
         target_phase_name = kwargs.get('phase', '')
         if not task.phase:
             return HttpResponseRedirect(project.get_absolute_url())
@@ -132,27 +188,46 @@ class TaskSetPhaseTo(View):
         if not target_phase_name:
             return HttpResponseRedirect(project.get_absolute_url())
 
-        target_phase = get_object_or_404(models.Phase, name=target_phase_name)
-        if target_phase.name == 'ongoing':
-            if task.phase.name == 'pending':
-                task.set_phase(target_phase_name)
-                return HttpResponseRedirect(project.get_absolute_url())
-        elif target_phase.name == 'finished':
-            if task.phase.name == 'ongoing' or target_phase_name == 'continuing':
-                task.work_left = 0
-                task.set_phase(target_phase_name)
-                return HttpResponseRedirect(project.get_absolute_url())
-        elif target_phase.name == 'done':
-            if task.phase.name == 'finished':
-                task.work_left = 0
-                task.set_phase(target_phase_name)
-                return HttpResponseRedirect(project.get_absolute_url())
+        target_phase = models.Phase.objects.get_cached(target_phase_name)
+        if not target_phase:
+            raise Http404
+        task.transition_to(target_phase.name)
         return HttpResponseRedirect(project.get_absolute_url())
 
 
-class TaskDelete(DeleteView):
+class TaskSetPhases(View):
+    """
+    Move many tasks of project to phases at once. Task ids are posted as 'tasks' and target phases as 'phase':
+    either one phase for all tasks or one for each task. Responds with outcome of each task
+    """
+    def post(self, request, *args, **kwargs):
+        project = get_object_or_404(models.Project, name=kwargs['project_name'])
+        if not project.can_edit(request.user):
+            raise Http404
+        task_ids = request.POST.getlist('tasks')
+        phase_names = request.POST.getlist('phase')
+        if len(phase_names) == 1:
+            phase_names = phase_names * len(task_ids)
+        if len(phase_names) != len(task_ids) or not all(task_id.isdigit() for task_id in task_ids):
+            return HttpResponseBadRequest('Give one phase or one phase for each task')
+
+        by_phase = {}
+        for task_id, phase_name in zip(task_ids, phase_names):
+            by_phase.setdefault(phase_name, []).append(int(task_id))
+        results = {}
+        for phase_name, ids in by_phase.items():
+            results.update((task_id, 'Not found') for task_id in ids)
+            try:
+                results.update(project.tasks.filter(pk__in=ids).transition_to(phase_name))
+            except ValueError as error:
+                results.update((task_id, str(error)) for task_id in ids)
+        return JsonResponse({'results': dict((str(task_id), result) for task_id, result in results.items())})
+
+
+class TaskDelete(ProjectTaskMixin, DeleteView):
     slug_field = 'name'
     model = models.Task
+    queryset = models.Task.objects.with_related()
     success_url = reverse_lazy('tasks:projects')
 
     def get_object(self):
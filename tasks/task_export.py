@@ -0,0 +1,54 @@
+import csv
+import json
+from .models import Project, Task
+
+CHUNK_SIZE = 2000
+# Same column names as in import, so exported tasks can be imported again
+FIELDS = ['project', 'name', 'title', 'description', 'order', 'phase', 'owner', 'work_left', 'work_done']
+LOOKUPS = ['project__name', 'name', 'title', 'description', 'order', 'phase__name', 'owner__username',
+           'work_left', 'work_done']
+# Projects are exported separately, so projects without tasks are included too
+PROJECT_FIELDS = ['name', 'title', 'description', 'created_by', 'task_count', 'work_left']
+PROJECT_LOOKUPS = ['name', 'title', 'description', 'created_by__username', 'task_count', 'work_left_total']
+
+
+def export_rows(tasks=None):
+    """
+    Tuples of FIELDS of tasks, ordered by project and order. Read with a server side cursor in chunks
+    and related names joined in the same query, so memory use does not grow with number of tasks
+    """
+    if tasks is None:
+        tasks = Task.objects.all()
+    tasks = tasks.order_by('project__name', 'order', 'id').values_list(*LOOKUPS)
+    return tasks.iterator(chunk_size=CHUNK_SIZE)
+
+
+def project_rows(projects=None):
+    """ Tuples of PROJECT_FIELDS of projects, ordered by name. Totals are the stored ones, so one query is enough """
+    if projects is None:
+        projects = Project.objects.all()
+    return projects.order_by('name').values_list(*PROJECT_LOOKUPS).iterator(chunk_size=CHUNK_SIZE)
+
+
+class _Echo(object):
+    """ File-like object that returns what is written, so csv.writer can produce one line at a time """
+    def write(self, value):
+        return value
+
+
+def csv_lines(rows, fields=FIELDS):
+    writer = csv.writer(_Echo())
+    yield writer.writerow(fields)
+    for row in rows:
+        yield writer.writerow(row)
+
+
+def json_lines(rows, fields=FIELDS):
+    for row in rows:
+        yield json.dumps(dict(zip(fields, row))) + '\n'
+
+
+FORMATS = {
+    'csv': (csv_lines, 'text/csv'),
+    'jsonl': (json_lines, 'application/x-ndjson'),
+}
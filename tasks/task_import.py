@@ -0,0 +1,143 @@
+import csv
+import itertools
+import json
+from django.db import transaction
+from django.utils.text import slugify
+from .models import Phase, Task
+from .project_totals import recalculate_totals
+from .task_order import ORDER_GAP, append_order
+
+BATCH_SIZE = 500
+NAME_MAX_LENGTH = Task._meta.get_field('name').max_length
+TITLE_MAX_LENGTH = Task._meta.get_field('title').max_length
+WORK_LEFT_DEFAULT = Task._meta.get_field('work_left').default
+WORK_LEFT_MAX = 32767  # Largest PositiveSmallIntegerField in all databases
+
+
+class TaskImportError(ValueError):
+    pass
+
+
+def parse_csv(lines):
+    """ Rows of CSV with header line. Columns: title, description, work_left and optionally name """
+    try:
+        for row in csv.DictReader(lines):
+            yield row
+    except csv.Error as error:
+        raise TaskImportError(str(error))
+
+
+def parse_json_lines(lines):
+    """ Rows of JSON lines, one object with same keys as CSV columns per line """
+    for line_number, line in enumerate(lines, 1):
+        if not line.strip():
+            continue
+        try:
+            row = json.loads(line)
+        except ValueError as error:
+            raise TaskImportError('Line %d: %s' % (line_number, error))
+        if not isinstance(row, dict):
+            raise TaskImportError('Line %d: Expected object' % line_number)
+        yield row
+
+
+PARSERS = {
+    'csv': parse_csv,
+    'jsonl': parse_json_lines,
+}
+
+
+def _text(row, row_number, field_name):
+    """ Text value of field, or '' if it is missing. JSON lines may have other types """
+    value = row.get(field_name)
+    if value is None:
+        return ''
+    if not isinstance(value, str):
+        raise TaskImportError('Row %d: %s must be text' % (row_number, field_name))
+    return value.strip()
+
+
+def _work_left(row, row_number):
+    work_left = row.get('work_left')
+    if work_left is None or work_left == '':
+        return WORK_LEFT_DEFAULT
+    if isinstance(work_left, int) and not isinstance(work_left, bool):
+        value = work_left
+    elif isinstance(work_left, str) and work_left.strip().isdigit():
+        value = int(work_left)
+    else:
+        value = -1
+    if not 0 <= value <= WORK_LEFT_MAX:
+        raise TaskImportError('Row %d: Invalid work_left: %s' % (row_number, work_left))
+    return value
+
+
+def _clean(row, row_number):
+    """ Task fields of one parsed row. Values that the database would not accept raise TaskImportError """
+    title = _text(row, row_number, 'title')
+    if not title:
+        raise TaskImportError('Row %d: Title missing' % row_number)
+    if len(title) > TITLE_MAX_LENGTH:
+        raise TaskImportError('Row %d: Title longer than %d characters' % (row_number, TITLE_MAX_LENGTH))
+    work_left = _work_left(row, row_number)
+    name = slugify(_text(row, row_number, 'name') or title) or 'task'
+    return name, title, _text(row, row_number, 'description') or None, work_left
+
+
+def _with_suffix(name, number):
+    if number == 1:
+        return name[:NAME_MAX_LENGTH]
+    suffix = '-%d' % number
+    return name[:NAME_MAX_LENGTH - len(suffix)] + suffix
+
+
+def _unique_names(project, names, taken):
+    """
+    Names made unique in project by adding -2, -3... in order of appearance. taken contains names already
+    used in this import and is updated. Existing names are looked up with one query per round of renaming
+    """
+    numbers = [1] * len(names)
+    unique = [_with_suffix(name, 1) for name in names]
+    pending = list(range(0, len(names)))
+    while pending:
+        existing = set(Task.objects.filter(project=project, name__in=[unique[i] for i in pending]).order_by()
+                       .values_list('name', flat=True))
+        conflicting = []
+        for i in pending:
+            if unique[i] in existing or unique[i] in taken:
+                numbers[i] += 1
+                unique[i] = _with_suffix(names[i], numbers[i])
+                conflicting.append(i)
+            else:
+                taken.add(unique[i])
+        pending = conflicting
+    return unique
+
+
+def import_tasks(project, rows, user, batch_size=BATCH_SIZE):
+    """
+    Create tasks of parsed rows after existing tasks of project. Tasks are inserted in batches with bulk_create
+    in one transaction, so either all rows or none are imported. Returns number of imported tasks
+    """
+    phase = Phase.objects.initial()
+    rows = iter(rows)
+    count = 0
+    taken = set()
+    with transaction.atomic():
+        order = append_order(project)
+        while True:
+            batch = [_clean(row, count + i) for i, row in enumerate(itertools.islice(rows, batch_size), 1)]
+            if not batch:
+                break
+            names = _unique_names(project, [name for name, title, description, work_left in batch], taken)
+            tasks = []
+            for name, (_, title, description, work_left) in zip(names, batch):
+                tasks.append(Task(project=project, name=name, title=title, description=description,
+                                  work_left=work_left, order=order, phase=phase, created_by=user))
+                order += ORDER_GAP
+            Task.objects.bulk_create(tasks)
+            count += len(tasks)
+        # bulk_create does not send signals that keep totals up to date
+        recalculate_totals([project.pk])
+    project.clear_cached_properties()
+    return count
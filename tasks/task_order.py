@@ -0,0 +1,138 @@
+from django.db import models, transaction
+from .models import Project, Task
+from .project_totals import increment_version
+
+# Orders are kept ORDER_GAP apart, so a task can usually be moved anywhere by giving it an order between its
+# new neighbours and updating only that row. When there is no room left, orders of the project are spread again.
+ORDER_GAP = 1024
+MAX_ORDER = 2147483647
+
+
+def _lock_project(project_id):
+    """ Lock project row until end of transaction, so concurrent reorders of it are done one after another """
+    list(Project.objects.select_for_update().filter(pk=project_id).values_list('id', flat=True))
+
+
+def _project(task):
+    return task.project if Task.project.is_cached(task) else task.project_id
+
+
+def _ordered(project_id):
+    return Task.objects.filter(project_id=project_id).order_by('order', 'id')
+
+
+def _update_orders(project, orders):
+    """ Write {task_id: order} with one UPDATE """
+    if not orders:
+        return
+    whens = [models.When(pk=task_id, then=models.Value(order)) for task_id, order in orders.items()]
+    Task.objects.filter(pk__in=orders).update(order=models.Case(*whens, output_field=models.IntegerField()))
+    increment_version(project)
+    if isinstance(project, Project):
+        project.clear_cached_properties()
+
+
+def _spread(project, task_ids, current=None):
+    """ Give tasks orders ORDER_GAP apart in the order of task_ids. Returns number of changed orders """
+    current = current or {}
+    orders = {task_id: (i + 1) * ORDER_GAP for i, task_id in enumerate(task_ids)}
+    changed = {task_id: order for task_id, order in orders.items() if current.get(task_id) != order}
+    _update_orders(project, changed)
+    return len(changed)
+
+
+def _order_between(before, after):
+    """ Free order between orders before and after. None as before or after means no task there """
+    if after is None:
+        order = ORDER_GAP if before is None else before + ORDER_GAP
+        return order if order <= MAX_ORDER else None
+    low = -1 if before is None else before
+    if after - low < 2:
+        return None
+    return (low + after) // 2
+
+
+def append_order(project):
+    """ Order for a new task after all existing tasks of project """
+    highest = project.tasks.aggregate(highest=models.Max('order'))['highest']
+    if highest is None:
+        return ORDER_GAP
+    if highest + ORDER_GAP > MAX_ORDER:
+        rebalance_orders([project.pk])
+        highest = project.tasks.aggregate(highest=models.Max('order'))['highest']
+    return highest + ORDER_GAP
+
+
+def reorder_tasks(project, task_ids):
+    """
+    Order tasks of project in the order of task_ids in one transaction.
+    task_ids must contain every task of the project exactly once. Returns number of tasks whose order changed
+    """
+    task_ids = list(task_ids)
+    with transaction.atomic():
+        _lock_project(project.pk)
+        current = dict(_ordered(project.pk).values_list('id', 'order'))
+        if len(task_ids) != len(current) or set(task_ids) != set(current):
+            raise ValueError('New order must contain every task of project %s exactly once' % project.name)
+        return _spread(project, task_ids, current)
+
+
+def move_to(task, position):
+    """
+    Move task to position (0 is first) among tasks of its project. Only the moved task is updated
+    unless there is no room between its new neighbours. Returns False if task already was in that position
+    """
+    position = max(0, position)
+    with transaction.atomic():
+        _lock_project(task.project_id)
+        task.order = Task.objects.filter(pk=task.pk).values_list('order', flat=True).get()
+        others = _ordered(task.project_id).exclude(pk=task.pk)
+        if position == 0:
+            neighbours = [None] + list(others.values_list('order', flat=True)[:1])
+        else:
+            neighbours = list(others.values_list('order', flat=True)[position - 1:position + 1])
+            if not neighbours:
+                # Past the end
+                neighbours = [others.aggregate(highest=models.Max('order'))['highest']]
+        before = neighbours[0]
+        after = neighbours[1] if len(neighbours) > 1 else None
+        if (before is None or before < task.order) and (after is None or task.order < after):
+            return False
+
+        order = _order_between(before, after)
+        if order is not None:
+            _update_orders(_project(task), {task.pk: order})
+        else:
+            current = dict(others.values_list('id', 'order'))
+            task_ids = list(current)
+            task_ids.insert(min(position, len(task_ids)), task.pk)
+            _spread(_project(task), task_ids, current)
+            order = (task_ids.index(task.pk) + 1) * ORDER_GAP
+    task.order = order
+    return True
+
+
+def move_by(task, direction):
+    """ Move task one position up (direction -1) or down (direction 1). Returns False if it can not be moved """
+    with transaction.atomic():
+        _lock_project(task.project_id)
+        order = Task.objects.filter(pk=task.pk).values_list('order', flat=True).get()
+        before = models.Q(order__lt=order) | models.Q(order=order, id__lt=task.pk)
+        position = _ordered(task.project_id).filter(before).count()
+        if position + direction < 0:
+            return False
+        return move_to(task, position + direction)
+
+
+def rebalance_orders(projects=None):
+    """ Spread orders of tasks of projects ORDER_GAP apart. Returns number of tasks whose order changed """
+    changed = 0
+    project_ids = Project.objects.all()
+    if projects is not None:
+        project_ids = project_ids.filter(pk__in=projects)
+    for project_id in project_ids.values_list('id', flat=True):
+        with transaction.atomic():
+            _lock_project(project_id)
+            current = list(_ordered(project_id).values_list('id', 'order'))
+            changed += _spread(project_id, [task_id for task_id, order in current], dict(current))
+    return changed
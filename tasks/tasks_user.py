@@ -3,6 +3,7 @@ from django.views.generic import ListView, DetailView
 from django.views.generic.edit import UpdateView, DeleteView, FormView
 from django.http import Http404
 from django.contrib import auth
+from .keyset import KeysetPaginationMixin
 
 
 def can_edit_user(logged_user, target_user):
@@ -14,8 +15,13 @@ def can_edit_user(logged_user, target_user):
     return False
 
 
-class TasksUserList(ListView):
+class TasksUserList(KeysetPaginationMixin, ListView):
     model = auth.get_user_model()
+    context_object_name = 'user_list'
+    template_name = 'auth/user_list.html'
+    keyset = ['username']
+    page_url_name = 'tasks:users'
+    more_url_name = 'tasks:users_more'
 
     def get_context_data(self, **kwargs):
         context = super(TasksUserList, self).get_context_data(**kwargs)
@@ -0,0 +1,39 @@
+from django import template
+from django.utils.html import format_html_join
+from django.utils.safestring import mark_safe
+
+register = template.Library()
+
+PHASE_COLORS = {
+    'ongoing': 'yellow',
+    'continuing': 'yellow',
+    'blocked': 'red',
+}
+DEFAULT_COLOR = 'green'
+EMPTY_COLOR = 'white'
+
+
+def bar_color(task):
+    """ Color of the bar of task in chart """
+    phase_name = task.phase.name if task.phase else None
+    return PHASE_COLORS.get(phase_name, DEFAULT_COLOR)
+
+
+def bar_segments(row):
+    """ (color, length in days) of the empty space before task and the task itself. Empty segments are left out """
+    segments = [(EMPTY_COLOR, row.cumulative_work_before), (bar_color(row.task), row.work_left)]
+    return [(color, length) for color, length in segments if length > 0]
+
+
+@register.simple_tag
+def gantt_cells(row, day_cells=False):
+    """
+    Table cells of one schedule row. By default each bar segment is one cell spanning all its days,
+    so the size of the chart does not grow with tasks * days. With day_cells each day gets its own cell.
+    """
+    segments = bar_segments(row)
+    if day_cells:
+        cell = '<td class="day-marker {}"> &nbsp; </td>'
+        return format_html_join('', cell, ((color,) for color, length in segments for i in range(0, length)))
+    cell = '<td class="day-marker {}" colspan="{}"> &nbsp; </td>'
+    return format_html_join('', cell, segments) if segments else mark_safe('')
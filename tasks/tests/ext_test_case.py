@@ -1,10 +1,18 @@
+from contextlib import contextmanager
+from django.db import connection
 from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
 from django.urls import reverse
 from django.contrib.auth.models import User
 from tasks import models
 
 
 class ExtTestCase(TestCase):
+    def setUp(self):
+        super(ExtTestCase, self).setUp()
+        # Phases cached in memory may be from a test whose transaction has already been rolled back
+        models.Phase.objects.clear_cache()
+
     def create_and_log_in_user(self):
         user = User.objects.create(username='test_user', email='tuser@iki.fi')
         user.set_password('pw')
@@ -21,3 +29,13 @@ class ExtTestCase(TestCase):
         models.Phase.objects.create(name='blocked', title='Blocked', order=6)
         models.Phase.objects.create(name='impediment', title='Impediment', order=7)
         self.assertEqual(models.Phase.objects.all().count(), 7)
+
+    @contextmanager
+    def assertMaxQueries(self, budget):
+        """ Fail if more than budget queries are executed inside the block """
+        with CaptureQueriesContext(connection) as context:
+            yield context
+        executed = len(context)
+        if executed > budget:
+            queries = '\n'.join('%d. %s' % (i, query['sql']) for i, query in enumerate(context.captured_queries, 1))
+            self.fail('%d queries executed, budget is %d\n%s' % (executed, budget, queries))
@@ -0,0 +1,119 @@
+import datetime
+import json
+from django.contrib.auth.models import User
+from django.urls import reverse
+from .ext_test_case import ExtTestCase
+from tasks.calculate_finish_date import calculate_finish_date
+from tasks.models import Project, Task
+
+
+class ApiTest(ExtTestCase):
+    def setUp(self):
+        super(ApiTest, self).setUp()
+        self.create_default_phases()
+        self.creator = User.objects.create(username='creator')
+        self.project = Project.objects.create(name='test_project', title='Test project', created_by=self.creator)
+        Project.objects.create(name='other_project', title='Other project', created_by=self.creator)
+        for i in range(0, 3):
+            Task.objects.create(project=self.project, name='task_%d' % i, title='Task %d' % i, order=i,
+                                work_left=i + 1, owner=self.creator, created_by=self.creator)
+        done = Task.objects.create(project=self.project, name='done_task', title='Done', order=3, work_left=0,
+                                   created_by=self.creator)
+        done.set_phase('done')
+
+    def get_json(self, url, **params):
+        response = self.client.get(url, params)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response['Content-Type'], 'application/json')
+        return json.loads(response.content.decode('utf-8'))
+
+    def test_reverse(self):
+        self.assertEqual(reverse('tasks:api_projects'), '/api/projects/')
+        self.assertEqual(reverse('tasks:api_project_tasks', args=['test_project']), '/api/project/test_project/tasks/')
+        self.assertEqual(reverse('tasks:api_task', args=['test_project', 'task_0']),
+                         '/api/project/test_project/task/task_0/')
+
+    def test_project_list(self):
+        data = self.get_json(reverse('tasks:api_projects'))
+        self.assertEqual([project['name'] for project in data['results']], ['other_project', 'test_project'])
+        project = data['results'][1]
+        self.assertEqual(project['task_count'], 4)
+        self.assertEqual(project['work_left'], 6)
+        self.assertEqual(project['finish_date'], calculate_finish_date(datetime.date.today(), 6).isoformat())
+        self.assertEqual(project['url'], '/project/test_project/')
+        self.assertIsNone(data['next'])
+
+    def test_project_list_pages(self):
+        data = self.get_json(reverse('tasks:api_projects'), limit=1)
+        self.assertEqual([project['name'] for project in data['results']], ['other_project'])
+        self.assertEqual(data['next'], 'other_project')
+        data = self.get_json(reverse('tasks:api_projects'), limit=1, after=data['next'])
+        self.assertEqual([project['name'] for project in data['results']], ['test_project'])
+        self.assertIsNone(data['next'])
+
+    def test_field_selection(self):
+        response = self.client.get(reverse('tasks:api_projects'), {'fields': 'name,work_left'})
+        self.assertEqual(response.content.decode('utf-8'),
+                         '{"results":[{"name":"other_project","work_left":0},'
+                         '{"name":"test_project","work_left":6}],"next":null}')
+
+    def test_bad_parameters(self):
+        url = reverse('tasks:api_project_tasks', args=['test_project'])
+        self.assertEqual(self.client.get(url, {'fields': 'name,secret'}).status_code, 400)
+        self.assertEqual(self.client.get(url, {'limit': '0'}).status_code, 400)
+        self.assertEqual(self.client.get(url, {'limit': 'all'}).status_code, 400)
+        self.assertEqual(self.client.get(url, {'after': 'missing_task'}).status_code, 400)
+
+    def test_project_tasks(self):
+        Task.objects.get(name='task_1').set_phase('ongoing')
+        data = self.get_json(reverse('tasks:api_project_tasks', args=['test_project']))
+        tasks = data['results']
+        self.assertEqual([task['name'] for task in tasks], ['task_0', 'task_1', 'task_2'])
+        self.assertEqual([task['cumulative_work_left'] for task in tasks], [1, 3, 6])
+        self.assertEqual(tasks[1]['cumulative_work_before'], 1)
+        self.assertEqual(tasks[1]['phase'], 'ongoing')
+        self.assertEqual(tasks[1]['owner'], 'creator')
+        self.assertEqual(tasks[2]['finish_date'], calculate_finish_date(datetime.date.today(), 6).isoformat())
+        # Same owner in all tasks, so forecast is same as schedule
+        self.assertEqual(tasks[2]['forecast_finish_date'], tasks[2]['finish_date'])
+        self.assertEqual(tasks[1]['forecast_start_date'], tasks[1]['start_date'])
+
+    def test_project_tasks_pages(self):
+        url = reverse('tasks:api_project_tasks', args=['test_project'])
+        data = self.get_json(url, limit=2, fields='name,cumulative_work_left')
+        self.assertEqual(data['results'], [{'name': 'task_0', 'cumulative_work_left': 1},
+                                           {'name': 'task_1', 'cumulative_work_left': 3}])
+        data = self.get_json(url, limit=2, fields='name,cumulative_work_left', after=data['next'])
+        self.assertEqual(data['results'], [{'name': 'task_2', 'cumulative_work_left': 6}])
+        self.assertIsNone(data['next'])
+
+    def test_task(self):
+        data = self.get_json(reverse('tasks:api_task', args=['test_project', 'task_1']))
+        self.assertEqual(data['title'], 'Task 1')
+        self.assertEqual(data['project'], 'test_project')
+        self.assertEqual(data['cumulative_work_left'], 3)
+        data = self.get_json(reverse('tasks:api_task', args=['test_project', 'done_task']))
+        self.assertEqual(data['phase'], 'done')
+        self.assertIsNone(data['finish_date'])
+        self.assertIsNone(data['forecast_finish_date'])
+
+    def test_task_dates_without_schedule(self):
+        url = reverse('tasks:api_task', args=['test_project', 'task_1'])
+        with self.assertNumQueries(1):
+            data = self.get_json(url, fields='cumulative_work_before,start_date,finish_date')
+        self.assertEqual(data['cumulative_work_before'], 1)
+        self.assertEqual(data['finish_date'], str(calculate_finish_date(datetime.date.today(), 3)))
+        data = self.get_json(url, fields='finish_date,forecast_finish_date')
+        self.assertEqual(data['forecast_finish_date'], data['finish_date'])
+
+    def test_not_modified(self):
+        url = reverse('tasks:api_project_tasks', args=['test_project'])
+        etag = self.client.get(url)['ETag']
+        self.assertEqual(self.client.get(url, HTTP_IF_NONE_MATCH=etag).status_code, 304)
+        Task.objects.get(name='task_0').delete()
+        self.assertEqual(self.client.get(url, HTTP_IF_NONE_MATCH=etag).status_code, 200)
+
+    def test_404_not_found(self):
+        self.assertEqual(self.client.get(reverse('tasks:api_project_tasks', args=['missing'])).status_code, 404)
+        self.assertEqual(self.client.get(reverse('tasks:api_task', args=['other_project', 'task_0'])).status_code,
+                         404)
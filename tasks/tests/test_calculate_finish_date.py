@@ -1,6 +1,19 @@
 import datetime
 from django.test import TestCase
-from tasks.calculate_finish_date import calculate_finish_date
+from tasks.calculate_finish_date import calculate_finish_date, calculate_finish_dates, first_working_day, working_days
+
+
+def step_finish_date(start_date, days_of_work):
+    # Reference implementation stepping one day at a time
+    one_day = datetime.timedelta(days=1)
+    while start_date.weekday() >= 5:
+        start_date += one_day
+    finish_date = start_date
+    for day in range(0, days_of_work):
+        finish_date += one_day
+        while finish_date.weekday() >= 5:
+            finish_date += one_day
+    return finish_date
 
 
 class CalculateFinishDateTest(TestCase):
@@ -41,3 +54,36 @@ class CalculateFinishDateTest(TestCase):
         finish_date = calculate_finish_date(start_date, 0)
         self.assertEqual(finish_date, datetime.date(2016, 9, 26))
         self.assertEqual(finish_date.weekday(), 0)  # Monday
+
+    def test_matches_day_by_day_calculation(self):
+        start_date = datetime.date(2016, 9, 19)
+        for start_offset in range(0, 14):
+            day = start_date + datetime.timedelta(days=start_offset)
+            for days_of_work in range(0, 40):
+                self.assertEqual(calculate_finish_date(day, days_of_work), step_finish_date(day, days_of_work))
+
+    def test_large_amount_of_work(self):
+        start_date = datetime.date(2016, 9, 21)  # Wednesday
+        self.assertEqual(calculate_finish_date(start_date, 5000), step_finish_date(start_date, 5000))
+
+
+class CalculateFinishDatesTest(TestCase):
+    def test_batch_matches_single(self):
+        start_date = datetime.date(2016, 9, 22)  # Thursday
+        offsets = [0, 1, 2, 3, 7, 12, 100]
+        finish_dates = calculate_finish_dates(start_date, offsets)
+        self.assertEqual(finish_dates, [calculate_finish_date(start_date, offset) for offset in offsets])
+
+    def test_empty_offsets(self):
+        self.assertEqual(calculate_finish_dates(datetime.date(2016, 9, 22), []), [])
+
+    def test_first_working_day(self):
+        self.assertEqual(first_working_day(datetime.date(2016, 9, 23)), datetime.date(2016, 9, 23))  # Friday
+        self.assertEqual(first_working_day(datetime.date(2016, 9, 24)), datetime.date(2016, 9, 26))  # Saturday
+        self.assertEqual(first_working_day(datetime.date(2016, 9, 25)), datetime.date(2016, 9, 26))  # Sunday
+
+    def test_working_days(self):
+        days = working_days(datetime.date(2016, 9, 22), 4)
+        self.assertEqual(days, [datetime.date(2016, 9, 22), datetime.date(2016, 9, 23),
+                                datetime.date(2016, 9, 26), datetime.date(2016, 9, 27)])
+        self.assertEqual(working_days(datetime.date(2016, 9, 22), 0), [])
@@ -0,0 +1,43 @@
+from django.core import checks
+from .ext_test_case import ExtTestCase
+from tasks.check_validity import check_phases, check_validity
+from tasks.models import Phase
+
+
+class CheckValidityTest(ExtTestCase):
+    def test_missing_phases(self):
+        invalidities = check_validity()
+        self.assertEqual(len(invalidities), 7)
+        self.assertIn('Phase pending not defined', invalidities)
+        Phase.objects.create(name='pending', title='Pending', order=1)
+        self.assertEqual(len(check_validity()), 6)
+        Phase.objects.filter(name='pending').delete()
+        self.assertEqual(len(check_validity()), 7)
+
+    def test_all_phases_defined(self):
+        self.create_default_phases()
+        self.assertEqual(check_validity(), [])
+
+    def test_checked_only_once_while_phases_do_not_change(self):
+        self.create_default_phases()
+        with self.assertNumQueries(1):
+            check_validity()
+        with self.assertNumQueries(0):
+            check_validity()
+
+    def test_system_check(self):
+        errors = check_phases(None)
+        self.assertEqual(len(errors), 7)
+        self.assertIsInstance(errors[0], checks.Warning)
+        self.assertEqual(errors[0].id, 'tasks.W001')
+        self.create_default_phases()
+        self.assertEqual(check_phases(None), [])
+        self.assertEqual([error for error in checks.run_checks(tags=[checks.Tags.database])
+                          if error.id == 'tasks.W001'], [])
+
+    def test_system_check_is_database_check(self):
+        # Not run by every manage.py command, only when database checks are asked for
+        with self.assertNumQueries(0):
+            self.assertEqual([error for error in checks.run_checks() if error.id == 'tasks.W001'], [])
+        self.assertEqual(len([error for error in checks.run_checks(tags=[checks.Tags.database])
+                              if error.id == 'tasks.W001']), 7)
@@ -0,0 +1,80 @@
+import datetime
+from django.contrib.auth.models import User
+from django.test import SimpleTestCase
+from .ext_test_case import ExtTestCase
+from tasks.forecast import Forecast, simulate
+from tasks.models import Phase, Project, Task
+
+
+class SimulateTest(SimpleTestCase):
+    def test_without_owners_tasks_are_done_one_after_another(self):
+        self.assertEqual(simulate([(None, 2), (None, 3), (None, 1)]), [(0, 2), (2, 5), (5, 6)])
+
+    def test_owners_work_in_parallel(self):
+        self.assertEqual(simulate([(1, 2), (2, 3), (1, 1), (2, 1)]), [(0, 2), (0, 3), (2, 3), (3, 4)])
+
+    def test_tasks_without_owner_are_done_by_first_free_owner(self):
+        times = simulate([(1, 1), (2, 4), (None, 2), (None, 2)])
+        self.assertEqual(times, [(0, 1), (0, 4), (1, 3), (3, 5)])
+
+    def test_order_is_priority(self):
+        # Owner 1 is free after first task. Task without owner comes before own second task
+        self.assertEqual(simulate([(1, 1), (None, 3), (1, 1)]), [(0, 1), (1, 4), (4, 5)])
+
+    def test_tasks_without_work_left(self):
+        self.assertEqual(simulate([(1, 0), (1, 2), (None, 0)]), [(0, 0), (0, 2), (2, 2)])
+        self.assertEqual(simulate([]), [])
+
+    def test_thousands_of_tasks(self):
+        tasks = [(i % 20 if i % 3 else None, i % 5 + 1) for i in range(0, 5000)]
+        # Time is measured by chart_size_benchmark, not here
+        times = simulate(tasks)
+        self.assertEqual(len(times), 5000)
+        self.assertLessEqual(max(finish for start, finish in times), sum(work for owner, work in tasks))
+
+    def test_dates(self):
+        forecast = Forecast(['a', 'b'], [(0, 2), (2, 5)], datetime.date(2016, 9, 22))  # Thursday
+        self.assertEqual(forecast.dates('a'), (datetime.date(2016, 9, 22), datetime.date(2016, 9, 26)))
+        self.assertEqual(forecast.dates('b'), (datetime.date(2016, 9, 26), datetime.date(2016, 9, 29)))
+        self.assertEqual(forecast.dates('c'), (None, None))
+        self.assertEqual(forecast.finish_date, datetime.date(2016, 9, 29))
+        self.assertEqual(Forecast([], []).total_days, 0)
+
+
+class ProjectForecastTest(ExtTestCase):
+    def setUp(self):
+        super(ProjectForecastTest, self).setUp()
+        self.create_default_phases()
+        self.creator = User.objects.create(username='creator')
+        owner = User.objects.create(username='owner')
+        self.project = Project.objects.create(name='test_project', created_by=self.creator)
+        Task.objects.create(project=self.project, name='task_1', order=1, work_left=4, owner=self.creator,
+                            created_by=self.creator)
+        Task.objects.create(project=self.project, name='task_2', order=2, work_left=3, owner=owner,
+                            created_by=self.creator)
+        self.task = Task.objects.create(project=self.project, name='task_3', order=3, work_left=2,
+                                        created_by=self.creator)
+        Task.objects.create(project=self.project, name='task_4', order=4, work_left=5, owner=owner,
+                            created_by=self.creator, phase=Phase.objects.get(name='finished'))
+        Phase.objects.cached()
+
+    def test_forecast(self):
+        project = Project.objects.get(pk=self.project.pk)
+        self.assertEqual(project.forecast.total_days, 5)
+        self.assertEqual(project.forecast.times[self.task.pk], (3, 5))
+        self.assertEqual(project.schedule.total_work_left, 9)
+
+    def test_simulated_once_per_version(self):
+        with self.assertNumQueries(2):  # Project and tasks
+            Project.objects.get(pk=self.project.pk).forecast
+        with self.assertNumQueries(1):
+            self.assertEqual(Project.objects.get(pk=self.project.pk).forecast.total_days, 5)
+        self.task.work_left = 6
+        self.task.save()
+        self.assertEqual(Project.objects.get(pk=self.project.pk).forecast.total_days, 9)
+
+    def test_tasks_of_schedule_are_used(self):
+        project = Project.objects.get(pk=self.project.pk)
+        project.schedule
+        with self.assertNumQueries(0):
+            self.assertEqual(project.forecast.total_days, 5)
@@ -0,0 +1,60 @@
+import datetime
+from io import StringIO
+from django.core.management import call_command
+from django.template import Context, Template
+from django.test import SimpleTestCase
+from tasks.models import Phase, Task
+from tasks.schedule import Schedule
+from tasks.templatetags.gantt import bar_color, bar_segments
+
+
+def create_schedule(*tasks):
+    return Schedule([Task(name='task_%d' % i, order=i, work_left=work_left, phase=Phase(name=phase_name))
+                     for i, (phase_name, work_left) in enumerate(tasks)], datetime.date(2017, 1, 2))
+
+
+class GanttCellsTest(SimpleTestCase):
+    def render(self, row, day_cells=False):
+        template = Template('{% load gantt %}{% gantt_cells row day_cells %}')
+        return template.render(Context({'row': row, 'day_cells': day_cells}))
+
+    def test_bar_color(self):
+        self.assertEqual(bar_color(Task(phase=Phase(name='ongoing'))), 'yellow')
+        self.assertEqual(bar_color(Task(phase=Phase(name='continuing'))), 'yellow')
+        self.assertEqual(bar_color(Task(phase=Phase(name='blocked'))), 'red')
+        self.assertEqual(bar_color(Task(phase=Phase(name='pending'))), 'green')
+        self.assertEqual(bar_color(Task()), 'green')
+
+    def test_bar_segments(self):
+        schedule = create_schedule(('ongoing', 2), ('blocked', 3), ('pending', 0))
+        self.assertEqual(bar_segments(schedule.rows[0]), [('yellow', 2)])
+        self.assertEqual(bar_segments(schedule.rows[1]), [('white', 2), ('red', 3)])
+        self.assertEqual(bar_segments(schedule.rows[2]), [('white', 5)])
+
+    def test_one_cell_per_segment(self):
+        schedule = create_schedule(('ongoing', 2), ('blocked', 3))
+        self.assertEqual(self.render(schedule.rows[1]),
+                         '<td class="day-marker white" colspan="2"> &nbsp; </td>'
+                         '<td class="day-marker red" colspan="3"> &nbsp; </td>')
+
+    def test_one_cell_per_day(self):
+        schedule = create_schedule(('ongoing', 1), ('pending', 2))
+        html = self.render(schedule.rows[1], day_cells=True)
+        self.assertEqual(html.count('<td class="day-marker white"> &nbsp; </td>'), 1)
+        self.assertEqual(html.count('<td class="day-marker green"> &nbsp; </td>'), 2)
+        self.assertNotIn('colspan', html)
+
+    def test_no_work(self):
+        schedule = create_schedule(('pending', 0))
+        self.assertEqual(self.render(schedule.rows[0]), '')
+
+
+class ChartSizeBenchmarkTest(SimpleTestCase):
+    def test_command(self):
+        out = StringIO()
+        call_command('chart_size_benchmark', '--tasks', '20', '--work-left', '2', stdout=out)
+        self.assertIn('20 tasks, 40 days of work', out.getvalue())
+        self.assertIn('day cells: ', out.getvalue())
+        self.assertIn('bar cells: ', out.getvalue())
+        self.assertIn('svg      : ', out.getvalue())
+        self.assertIn('forecast : 10 days with 4 owners', out.getvalue())
@@ -0,0 +1,42 @@
+from unittest import skipUnless
+from django.contrib.auth.models import User
+from django.db import connection
+from .ext_test_case import ExtTestCase
+from tasks.models import Project, Task
+
+
+@skipUnless(connection.vendor == 'sqlite', 'Query plans are checked from SQLite EXPLAIN QUERY PLAN output')
+class IndexUsageTest(ExtTestCase):
+    """ Hot queries must search tasks through an index, not scan the whole table """
+    def setUp(self):
+        super(IndexUsageTest, self).setUp()
+        self.create_default_phases()
+        creator = User.objects.create(username='creator')
+        self.project = Project.objects.create(name='test_project', created_by=creator)
+        self.task = Task.objects.create(project=self.project, name='task_1', order=5, work_left=2,
+                                        created_by=creator)
+
+    def assertUsesIndex(self, queryset, index_name):
+        plan = queryset.explain()
+        self.assertIn('tasks_task USING INDEX %s ' % index_name, plan)
+        self.assertNotIn('SCAN tasks_task', plan)
+
+    def test_unfinished_tasks(self):
+        self.assertUsesIndex(self.project.tasks_unfinished, 'task_project_order_idx')
+
+    def test_tasks_by_phase(self):
+        self.assertUsesIndex(self.project.tasks_by_phase_name('ongoing'), 'task_project_phase_order_idx')
+
+    def test_weekly_report_tasks(self):
+        self.assertUsesIndex(self.project.tasks_this_week, 'task_project_order_idx')
+
+    def test_tasks_in_order(self):
+        self.assertUsesIndex(self.project.tasks.order_by('order', 'id'), 'task_project_order_idx')
+
+    def test_work_before_task(self):
+        preceding_tasks = Task.objects.filter(project=self.project, order__lt=self.task.order, work_left__gt=0)
+        self.assertUsesIndex(preceding_tasks, 'task_work_left_idx')
+
+    def test_task_list_page(self):
+        tasks = Task.objects.order_by('order', 'title', 'id').filter(order__gt=self.task.order)[:50]
+        self.assertUsesIndex(tasks, 'task_order_title_idx')
@@ -1,9 +1,15 @@
 import datetime
+from unittest import mock
+from django.core.cache import caches
+from django.db import IntegrityError, connection, transaction
 from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
 from django.contrib.auth.models import User
 from django.urls import reverse
 from .ext_test_case import ExtTestCase
+from tasks.calculate_finish_date import calculate_finish_date
 from tasks.models import Project, Priority, TaskStatus, Phase, Task
+from tasks.project_totals import find_mismatches
 
 
 class ProjectModelTest(ExtTestCase):
@@ -38,6 +44,23 @@ class ProjectModelTest(ExtTestCase):
         Task.objects.create(project=project, name='task_3', work_left=3, created_by=creator)
         self.assertEqual(project.total_work_left, 6)
 
+    def test_with_task_totals(self):
+        creator = User.objects.create(username='creator')
+        project = Project.objects.create(name='test_project', created_by=creator)
+        Project.objects.create(name='empty_project', created_by=creator)
+        Task.objects.create(project=project, name='task_1', work_left=1, created_by=creator)
+        Task.objects.create(project=project, name='task_2', work_left=2, created_by=creator)
+        Project.objects.filter(pk=project.pk).update(task_count=0, work_left_total=0)  # Stored totals out of date
+        with self.assertNumQueries(1):
+            projects = list(Project.objects.with_task_totals().order_by('name'))
+            self.assertEqual([p.total_task_count for p in projects], [0, 2])
+            self.assertEqual([p.total_work_left for p in projects], [0, 3])
+            self.assertEqual(projects[1].finish_date, calculate_finish_date(datetime.date.today(), 3))
+            self.assertEqual(projects[1].created_by, creator)
+        project = Project.objects.get(pk=project.pk)
+        self.assertEqual(project.total_task_count, 0)
+        self.assertEqual(project.total_work_left, 0)
+
     def test_total_work_left_string(self):
         creator = User.objects.create(username='creator')
         project = Project.objects.create(name='test_project', created_by=creator)
@@ -60,6 +83,45 @@ class ProjectModelTest(ExtTestCase):
         if today.weekday() < 5:  # Does not work on weekends
             self.assertEqual(project.finish_date, today)
 
+    def test_build_schedule(self):
+        self.create_default_phases()
+        creator = User.objects.create(username='creator')
+        project = Project.objects.create(name='test_project', created_by=creator)
+        done = Phase.objects.get(name='done')
+        ongoing = Phase.objects.get(name='ongoing')
+        Task.objects.create(project=project, order=0, name='task_0', work_left=0, created_by=creator, phase=done)
+        task_1 = Task.objects.create(project=project, order=1, name='task_1', work_left=2, created_by=creator,
+                                     phase=ongoing)
+        task_2 = Task.objects.create(project=project, order=2, name='task_2', work_left=3, created_by=creator)
+        task_3 = Task.objects.create(project=project, order=2, name='task_3', work_left=1, created_by=creator)
+        start_date = datetime.date(2016, 9, 22)  # Thursday
+        Phase.objects.cached()  # Phases are loaded once per process
+        with self.assertNumQueries(1):
+            schedule = project.build_schedule(start_date)
+            self.assertEqual([row.task for row in schedule.rows], [task_1, task_2, task_3])
+            self.assertEqual(schedule.rows[0].task.phase, ongoing)
+        self.assertEqual([row.cumulative_work_before for row in schedule.rows], [0, 2, 2])
+        self.assertEqual([row.cumulative_work_left for row in schedule.rows], [2, 5, 3])
+        self.assertEqual(len(schedule.rows[1].cumulative_work_before_list), 2)
+        self.assertEqual(len(schedule.rows[1].work_left_list), 3)
+        self.assertEqual(schedule.rows[0].start_date, start_date)
+        self.assertEqual(schedule.rows[0].finish_date, datetime.date(2016, 9, 26))
+        self.assertEqual(schedule.rows[1].start_date, datetime.date(2016, 9, 26))
+        self.assertEqual(schedule.rows[1].finish_date, datetime.date(2016, 9, 29))
+        self.assertEqual(schedule.total_work_left, 6)
+        self.assertEqual(schedule.total_work_left_string, '1 week(s), 1 day(s)')
+        self.assertEqual(schedule.finish_date, datetime.date(2016, 9, 30))
+        self.assertEqual(len(schedule.days), 6)
+        self.assertEqual(schedule.days[0], start_date)
+
+    def test_build_schedule_no_tasks(self):
+        creator = User.objects.create(username='creator')
+        project = Project.objects.create(name='test_project', created_by=creator)
+        schedule = project.build_schedule(datetime.date(2016, 9, 22))
+        self.assertEqual(schedule.rows, [])
+        self.assertEqual(schedule.total_work_left, 0)
+        self.assertEqual(schedule.finish_date, datetime.date(2016, 9, 22))
+
     def test_get_tasks_by_phase(self):
         self.create_default_phases()
         creator = User.objects.create(username='creator')
@@ -149,6 +211,42 @@ class ProjectModelTest(ExtTestCase):
         self.assertEqual(project.tasks_by_phase_name('done').count(), 1)
         self.assertEqual(project.tasks_by_phase_name('blocked').count(), 1)
 
+    def test_task_lists_are_computed_once(self):
+        self.create_default_phases()
+        creator = User.objects.create(username='creator')
+        project = Project.objects.create(name='test_project', created_by=creator)
+        ongoing = Phase.objects.get(name='ongoing')
+        Task.objects.create(project=project, name='task_1', work_left=1, created_by=creator, phase=ongoing)
+        project = Project.objects.get(pk=project.pk)
+        Phase.objects.cached()
+        with self.assertNumQueries(2):
+            self.assertTrue(project.tasks_this_week)
+            self.assertEqual(len(project.tasks_this_week), 1)
+            self.assertEqual(project.tasks_this_week[0].name, 'task_1')
+            self.assertEqual(len(project.schedule.rows), 1)
+            self.assertEqual(project.schedule.total_work_left, 1)
+
+    def test_cached_task_lists_are_cleared_when_tasks_change(self):
+        self.create_default_phases()
+        creator = User.objects.create(username='creator')
+        project = Project.objects.create(name='test_project', created_by=creator)
+        ongoing = Phase.objects.get(name='ongoing')
+        task = Task.objects.create(project=project, name='task_1', work_left=1, created_by=creator, phase=ongoing)
+        self.assertEqual(len(project.tasks_this_week), 1)
+        self.assertEqual(project.schedule.total_work_left, 1)
+        task.set_phase('finished')
+        self.assertEqual(len(project.tasks_this_week), 0)
+        self.assertEqual(len(project.tasks_last_week), 1)
+        self.assertEqual(project.schedule.total_work_left, 0)
+        task.delete()
+        self.assertEqual(len(project.tasks_last_week), 0)
+        self.assertEqual(len(project.tasks_this_week), 0)
+        Task.objects.create(project=Project.objects.get(pk=project.pk), name='task_2', created_by=creator,
+                            phase=ongoing)
+        self.assertEqual(len(project.tasks_this_week), 0)  # Changed through another object
+        project.refresh_from_db()
+        self.assertEqual(len(project.tasks_this_week), 1)
+
     def test_get_impediments(self):
         self.create_default_phases()
         creator = User.objects.create(username='creator')
@@ -161,6 +259,23 @@ class ProjectModelTest(ExtTestCase):
         self.assertEqual(project.impediments.count(), 1)
         self.assertEqual(project.tasks_unfinished.count(), 0)
 
+    def test_cumulative_work_does_not_depend_on_queryset(self):
+        self.create_default_phases()
+        creator = User.objects.create(username='creator')
+        project = Project.objects.create(name='test_project', created_by=creator)
+        impediment = Task.objects.create(project=project, order=1, name='impediment', work_left=5, created_by=creator)
+        impediment.set_phase('impediment')
+        task = Task.objects.create(project=project, order=2, name='task_2', work_left=2, created_by=creator)
+        task.set_phase('ongoing')
+        pending = Task.objects.create(project=project, order=3, name='task_3', work_left=1, created_by=creator)
+        # Impediment is not part of the schedule, so it does not delay the tasks after it
+        self.assertEqual([task.cumulative_work_before for task in project.tasks_unfinished], [0, 2])
+        self.assertEqual([task.cumulative_work_before for task in project.tasks_not_done], [0, 0, 2])
+        self.assertEqual(Task.objects.get(pk=pending.pk).cumulative_work_before, 2)
+        self.assertEqual([row.cumulative_work_before for row in project.schedule.rows], [0, 2])
+        not_done = dict((task.pk, task) for task in project.tasks_not_done)
+        self.assertEqual(not_done[pending.pk].finish_date, project.schedule.rows[1].finish_date)
+
 
 class PriorityModelTest(TestCase):
     def test_can_save_and_load(self):
@@ -191,6 +306,63 @@ class PhaseModelTest(TestCase):
         self.assertEqual(str(phase), 'Ongoing')
 
 
+class PhaseCacheTest(ExtTestCase):
+    def test_get_cached(self):
+        self.create_default_phases()
+        ongoing = Phase.objects.get(name='ongoing')
+        with self.assertNumQueries(1):
+            self.assertEqual(Phase.objects.get_cached('ongoing'), ongoing)
+        with self.assertNumQueries(0):
+            self.assertEqual(Phase.objects.get_cached('done').name, 'done')
+            self.assertEqual(Phase.objects.get_cached('missing'), None)
+            self.assertEqual([phase.name for phase in Phase.objects.cached()],
+                             ['pending', 'ongoing', 'continuing', 'finished', 'done', 'blocked', 'impediment'])
+            self.assertEqual(Phase.objects.initial().name, 'pending')
+
+    def test_no_phases(self):
+        self.assertEqual(Phase.objects.cached(), [])
+        self.assertEqual(Phase.objects.initial(), None)
+
+    def test_cache_cleared_when_phases_change(self):
+        self.assertEqual(Phase.objects.get_cached('ongoing'), None)
+        phase = Phase.objects.create(name='ongoing', title='Ongoing')
+        self.assertEqual(Phase.objects.get_cached('ongoing'), phase)
+        phase.title = 'Started'
+        phase.save()
+        self.assertEqual(Phase.objects.get_cached('ongoing').title, 'Started')
+        phase.delete()
+        self.assertEqual(Phase.objects.get_cached('ongoing'), None)
+
+    def test_reloaded_when_version_changes(self):
+        phase = Phase.objects.create(name='ongoing', title='Ongoing')
+        self.assertEqual(Phase.objects.get_cached('ongoing'), phase)
+        Phase.objects.filter(pk=phase.pk).update(title='Changed in another process')
+        self.assertEqual(Phase.objects.get_cached('ongoing').title, 'Ongoing')
+        caches[Phase.objects.cache_alias].set(Phase.objects.version_key, 'new version')
+        # Version is checked once per request
+        self.assertEqual(Phase.objects.get_cached('ongoing').title, 'Ongoing')
+        Phase.objects.check_version()
+        self.assertEqual(Phase.objects.get_cached('ongoing').title, 'Changed in another process')
+
+    def test_version_read_once_per_request(self):
+        self.create_default_phases()
+        shared_cache = caches[Phase.objects.cache_alias]
+        with mock.patch.object(shared_cache, 'get', wraps=shared_cache.get) as get:
+            self.client.get(reverse('tasks:projects_weekly'))
+        self.assertEqual(get.call_count, 1)
+
+    def test_set_phase_does_not_query_phases(self):
+        self.create_default_phases()
+        creator = User.objects.create(username='creator')
+        project = Project.objects.create(name='test_project', created_by=creator)
+        task = Task.objects.create(project=project, name='task_1', work_left=0, created_by=creator)
+        Phase.objects.cached()
+        with CaptureQueriesContext(connection) as queries:
+            task.set_phase('ongoing')
+        self.assertFalse([query for query in queries if 'tasks_phase' in query['sql']])
+        self.assertEqual(Task.objects.get(pk=task.pk).phase.name, 'ongoing')
+
+
 class TaskModelTest(TestCase):
     def test_can_save_and_load(self):
         creator = User.objects.create(username='creator')
@@ -206,6 +378,16 @@ class TaskModelTest(TestCase):
         task = Task.objects.create(project=project, name='test_task', title='Test task', created_by=creator)
         self.assertEqual(task.get_absolute_url(), '/project/test_project/task/test_task/')
 
+    def test_name_is_unique_in_project(self):
+        creator = User.objects.create(username='creator')
+        project = Project.objects.create(name='test_project', created_by=creator)
+        other_project = Project.objects.create(name='other_project', created_by=creator)
+        Task.objects.create(project=project, name='release', created_by=creator)
+        Task.objects.create(project=other_project, name='release', created_by=creator)
+        with self.assertRaises(IntegrityError), transaction.atomic():
+            Task.objects.create(project=project, name='release', created_by=creator)
+        self.assertEqual(Task.objects.filter(name='release').count(), 2)
+
     def test_convert_to_string(self):
         creator = User.objects.create(username='creator')
         project = Project.objects.create(name='test_project', created_by=creator)
@@ -245,6 +427,26 @@ class TaskModelTest(TestCase):
         self.assertEqual(len(task_3.cumulative_work_before_list), 4)
         self.assertEqual(task_3.cumulative_work_left, 6)
 
+    def test_with_cumulative_work(self):
+        creator = User.objects.create(username='creator')
+        project = Project.objects.create(name='test_project', created_by=creator)
+        other_project = Project.objects.create(name='other_project', created_by=creator)
+        Task.objects.create(project=project, order=1, name='task_1', work_left=1, created_by=creator)
+        Task.objects.create(project=project, order=3, name='task_3', work_left=2, created_by=creator)
+        Task.objects.create(project=project, order=2, name='task_2a', work_left=3, created_by=creator)
+        Task.objects.create(project=project, order=2, name='task_2b', work_left=4, created_by=creator)
+        Task.objects.create(project=other_project, order=0, name='other_task', work_left=5, created_by=creator)
+        with self.assertNumQueries(1):
+            tasks = list(Task.objects.filter(project=project).with_cumulative_work())
+            self.assertEqual([task.name for task in tasks], ['task_1', 'task_2a', 'task_2b', 'task_3'])
+            self.assertEqual([task.cumulative_work_before for task in tasks], [0, 1, 1, 8])
+            self.assertEqual([task.cumulative_work_left for task in tasks], [1, 4, 5, 10])
+            self.assertEqual(len(tasks[3].cumulative_work_before_list), 8)
+        for task in tasks:
+            self.assertEqual(task.cumulative_work_before, Task.objects.get(pk=task.pk).cumulative_work_before)
+        other_task = Task.objects.filter(project=other_project).with_cumulative_work().get()
+        self.assertEqual(other_task.cumulative_work_before, 0)
+
     def test_finish_date(self):
         creator = User.objects.create(username='creator')
         project = Project.objects.create(name='test_project', created_by=creator)
@@ -305,14 +507,12 @@ class TaskModelTest(TestCase):
         self.assertTrue(is_success)
         task_1 = Task.objects.get(name='task_1')
         task_2 = Task.objects.get(name='task_2')
-        self.assertEqual(task_1.order, 2)
-        self.assertEqual(task_2.order, 1)
+        self.assertLess(task_2.order, task_1.order)
         self.assertEqual(task_2.next, task_1)
         self.assertEqual(task_1.prev, task_2)
         is_success = task_2.move_up()
         self.assertFalse(is_success)
-        self.assertEqual(task_1.order, 2)
-        self.assertEqual(task_2.order, 1)
+        self.assertLess(task_2.order, task_1.order)
 
     def test_move_down(self):
         creator = User.objects.create(username='creator')
@@ -327,14 +527,12 @@ class TaskModelTest(TestCase):
         self.assertTrue(is_success)
         task_1 = Task.objects.get(name='task_1')
         task_2 = Task.objects.get(name='task_2')
-        self.assertEqual(task_1.order, 2)
-        self.assertEqual(task_2.order, 1)
+        self.assertLess(task_2.order, task_1.order)
         self.assertEqual(task_2.next, task_1)
         self.assertEqual(task_1.prev, task_2)
         is_success = task_1.move_down()
         self.assertFalse(is_success)
-        self.assertEqual(task_1.order, 2)
-        self.assertEqual(task_2.order, 1)
+        self.assertLess(task_2.order, task_1.order)
 
     def test_next_phase_url(self):
         creator = User.objects.create(username='creator')
@@ -354,3 +552,55 @@ class TaskModelTest(TestCase):
         self.assertEqual(task_3.next_phase_url['url'],
                          reverse('tasks:task_set_phase_to', args=[project.name, task_3.name, 'done']))
         self.assertEqual(task_3.next_phase_url['title'], 'Archive')
+
+
+class PhaseTransitionTest(ExtTestCase):
+    def setUp(self):
+        super(PhaseTransitionTest, self).setUp()
+        self.create_default_phases()
+        self.creator = User.objects.create(username='creator')
+        self.project = Project.objects.create(name='test_project', created_by=self.creator)
+
+    def create_task(self, name, phase_name, work_left=3):
+        return Task.objects.create(project=self.project, name=name, work_left=work_left,
+                                   phase=Phase.objects.get_cached(phase_name), created_by=self.creator)
+
+    def test_task_transition(self):
+        task = self.create_task('task_1', 'pending')
+        self.assertFalse(task.transition_to('finished'))
+        self.assertTrue(task.transition_to('ongoing'))
+        self.assertTrue(task.transition_to('continuing'))
+        self.assertEqual(task.work_left, 3)
+        self.assertTrue(task.transition_to('finished'))
+        self.assertEqual(task.work_left, 0)
+        self.assertFalse(task.transition_to('pending'))
+        self.assertTrue(task.transition_to('done'))
+        self.assertEqual(Task.objects.get(pk=task.pk).phase.name, 'done')
+
+    def test_bulk_transition(self):
+        finished = [self.create_task('finished_%d' % i, 'finished', 0) for i in range(0, 3)]
+        ongoing = [self.create_task('ongoing_%d' % i, 'ongoing') for i in range(0, 3)]
+        pending = self.create_task('pending', 'pending')
+        tasks = Task.objects.filter(pk__in=[task.pk for task in finished + ongoing + [pending]])
+        with self.assertNumQueries(1):
+            Task.objects.filter(phase__name='blocked').transition_to('done')
+        results = tasks.transition_to('finished')
+        self.assertEqual(results[ongoing[0].pk], 'finished')
+        self.assertEqual(results[pending.pk], 'Can not move from pending to finished')
+        self.assertEqual(results[finished[0].pk], 'Can not move from finished to finished')
+        self.assertEqual(Task.objects.filter(phase__name='finished').count(), 6)
+        self.assertEqual(Task.objects.get(pk=ongoing[0].pk).work_left, 0)
+        self.assertEqual(Task.objects.get(pk=pending.pk).work_left, 3)
+        self.assertEqual(find_mismatches(), [])
+        self.assertEqual(Project.objects.get(pk=self.project.pk).work_left_total, 3)
+
+    def test_bulk_transition_uses_one_update(self):
+        ongoing = [self.create_task('ongoing_%d' % i, 'ongoing') for i in range(0, 20)]
+        with CaptureQueriesContext(connection) as queries:
+            Task.objects.filter(project=self.project).transition_to('continuing')
+        self.assertEqual(len([query for query in queries if query['sql'].startswith('UPDATE "tasks_task"')]), 1)
+        self.assertEqual(Task.objects.filter(phase__name='continuing').count(), len(ongoing))
+
+    def test_unknown_phase(self):
+        with self.assertRaises(ValueError):
+            Task.objects.all().transition_to('blocked')
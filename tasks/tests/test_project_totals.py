@@ -0,0 +1,163 @@
+from io import StringIO
+from unittest import mock
+from django.contrib.auth.models import User
+from django.core.management import call_command, CommandError
+from django.db import connection
+from django.db.models import QuerySet
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from .ext_test_case import ExtTestCase
+from tasks.models import Project, ProjectPhaseTotal, Phase, Task
+from tasks.project_totals import calculate_totals, find_mismatches, recalculate_totals
+
+
+class ProjectTotalsTest(ExtTestCase):
+    def setUp(self):
+        self.create_default_phases()
+        self.creator = User.objects.create(username='creator')
+        self.project = Project.objects.create(name='test_project', created_by=self.creator)
+
+    def assertTotalsCorrect(self, project):
+        stored = Project.objects.get(pk=project.pk)
+        self.assertEqual(stored.task_count, project.tasks.count())
+        self.assertEqual(stored.work_left_total, sum(task.work_left for task in project.tasks.all()))
+        self.assertEqual(find_mismatches(), [])
+
+    def phase_total(self, phase_name):
+        total = ProjectPhaseTotal.objects.filter(project=self.project, phase__name=phase_name).first()
+        return (total.task_count, total.work_left) if total else (0, 0)
+
+    def test_create_task(self):
+        pending = Phase.objects.get(name='pending')
+        Task.objects.create(project=self.project, name='task_1', work_left=3, phase=pending, created_by=self.creator)
+        Task.objects.create(project=self.project, name='task_2', work_left=2, created_by=self.creator)
+        self.assertEqual(self.project.task_count, 2)
+        self.assertEqual(self.project.work_left_total, 5)
+        self.assertEqual(self.project.total_work_left, 5)
+        self.assertEqual(self.phase_total('pending'), (1, 3))
+        self.assertTotalsCorrect(self.project)
+
+    def test_update_work_left_and_phase(self):
+        pending = Phase.objects.get(name='pending')
+        task = Task.objects.create(project=self.project, name='task_1', work_left=3, phase=pending,
+                                   created_by=self.creator)
+        task = Task.objects.get(pk=task.pk)
+        task.work_left = 1
+        task.save()
+        self.assertTotalsCorrect(self.project)
+        self.assertEqual(self.phase_total('pending'), (1, 1))
+        task.set_phase('ongoing')
+        self.assertEqual(self.phase_total('pending'), (0, 0))
+        self.assertEqual(self.phase_total('ongoing'), (1, 1))
+        self.assertTotalsCorrect(self.project)
+        task.title = 'No change in totals'
+        with self.assertNumQueries(2):  # Task and project version
+            task.save()
+
+    def test_move_task_to_another_project(self):
+        other_project = Project.objects.create(name='other_project', created_by=self.creator)
+        task = Task.objects.create(project=self.project, name='task_1', work_left=3, created_by=self.creator)
+        task.project = other_project
+        task.save()
+        self.assertEqual(Project.objects.get(pk=self.project.pk).work_left_total, 0)
+        self.assertEqual(other_project.work_left_total, 3)
+        self.assertEqual(other_project.task_count, 1)
+        self.assertTotalsCorrect(self.project)
+        self.assertTotalsCorrect(other_project)
+
+    def test_delete_task(self):
+        task = Task.objects.create(project=self.project, name='task_1', work_left=3, created_by=self.creator)
+        Task.objects.create(project=self.project, name='task_2', work_left=2, created_by=self.creator)
+        task.delete()
+        self.assertTotalsCorrect(self.project)
+        self.assertEqual(Project.objects.get(pk=self.project.pk).work_left_total, 2)
+
+    def test_delete_phase_with_tasks(self):
+        pending = Phase.objects.get(name='pending')
+        Task.objects.create(project=self.project, name='task_1', work_left=3, phase=pending, created_by=self.creator)
+        pending.delete()
+        self.assertTotalsCorrect(self.project)
+
+    def test_saving_project_does_not_overwrite_totals(self):
+        project = Project.objects.get(pk=self.project.pk)
+        Task.objects.create(project=self.project, name='task_1', work_left=3, created_by=self.creator)
+        project.title = 'Updated'
+        project.save()
+        self.assertEqual(Project.objects.get(pk=self.project.pk).work_left_total, 3)
+        self.assertEqual(Project.objects.get(pk=self.project.pk).title, 'Updated')
+
+    def test_recalculate(self):
+        Task.objects.create(project=self.project, name='task_1', work_left=3, created_by=self.creator)
+        Project.objects.filter(pk=self.project.pk).update(work_left_total=10)
+        ProjectPhaseTotal.objects.all().delete()
+        self.assertEqual(find_mismatches(), [self.project.pk])
+        recalculate_totals([self.project.pk])
+        self.assertEqual(find_mismatches(), [])
+        self.assertEqual(calculate_totals(), {self.project.pk: (1, 3, {None: (1, 3)})})
+
+    def test_totals_out_of_date_are_not_made_negative(self):
+        # Project that existed before totals were stored
+        task = Task.objects.create(project=self.project, name='task_1', work_left=3, created_by=self.creator)
+        Project.objects.filter(pk=self.project.pk).update(task_count=0, work_left_total=0)
+        ProjectPhaseTotal.objects.update(task_count=0, work_left=0)
+        Task.objects.get(pk=task.pk).delete()
+        stored = Project.objects.get(pk=self.project.pk)
+        self.assertEqual((stored.task_count, stored.work_left_total), (0, 0))
+
+    def test_totals_are_filled_after_migrate(self):
+        Task.objects.create(project=self.project, name='task_1', work_left=3, created_by=self.creator)
+        Project.objects.filter(pk=self.project.pk).update(task_count=0, work_left_total=0)
+        ProjectPhaseTotal.objects.all().delete()
+        call_command('migrate', verbosity=0)
+        self.assertTotalsCorrect(self.project)
+
+    def test_phase_total_created_concurrently(self):
+        pending = Phase.objects.get(name='pending')
+        original_update = QuerySet.update
+
+        def update(queryset, **kwargs):
+            if queryset.model is ProjectPhaseTotal and not ProjectPhaseTotal.objects.exists():
+                # Another save creates the phase total after this one has found none to update
+                ProjectPhaseTotal.objects.create(project=self.project, phase=pending, task_count=1, work_left=2)
+                return 0
+            return original_update(queryset, **kwargs)
+
+        with mock.patch.object(QuerySet, 'update', autospec=True, side_effect=update):
+            Task.objects.create(project=self.project, name='task_1', work_left=3, phase=pending,
+                                created_by=self.creator)
+        self.assertEqual(self.phase_total('pending'), (2, 5))
+
+    def test_command_verify(self):
+        Task.objects.create(project=self.project, name='task_1', work_left=3, created_by=self.creator)
+        out = StringIO()
+        call_command('recalculate_project_totals', '--verify', stdout=out)
+        self.assertIn('Totals are up to date', out.getvalue())
+        Project.objects.filter(pk=self.project.pk).update(work_left_total=10)
+        with self.assertRaises(CommandError):
+            call_command('recalculate_project_totals', '--verify', stdout=StringIO())
+        self.assertEqual(Project.objects.get(pk=self.project.pk).work_left_total, 10)
+
+    def test_command_recalculate(self):
+        Task.objects.create(project=self.project, name='task_1', work_left=3, created_by=self.creator)
+        Project.objects.filter(pk=self.project.pk).update(work_left_total=10)
+        out = StringIO()
+        call_command('recalculate_project_totals', stdout=out)
+        self.assertIn('Totals out of date: test_project', out.getvalue())
+        self.assertEqual(Project.objects.get(pk=self.project.pk).work_left_total, 3)
+        with self.assertRaises(CommandError):
+            call_command('recalculate_project_totals', 'missing_project', stdout=StringIO())
+
+    def test_project_list_query_count_does_not_depend_on_project_count(self):
+        Task.objects.create(project=self.project, name='task_1', work_left=3, created_by=self.creator)
+        self.client.get(reverse('tasks:projects'))  # Load phases
+        with CaptureQueriesContext(connection) as one_project:
+            response = self.client.get(reverse('tasks:projects'))
+        for i in range(0, 10):
+            project = Project.objects.create(name='project_%d' % i, created_by=self.creator)
+            Task.objects.create(project=project, name='other_task_%d' % i, work_left=i, created_by=self.creator)
+        with CaptureQueriesContext(connection) as many_projects:
+            response = self.client.get(reverse('tasks:projects'))
+        self.assertContains(response, '<td> 9 </td>', html=False)
+        self.assertEqual(len(many_projects), len(one_project))
+        # Stored totals are shown, tasks are not joined and grouped again
+        self.assertFalse([query for query in many_projects.captured_queries if 'GROUP BY' in query['sql']])
@@ -0,0 +1,74 @@
+from django.contrib.auth.models import User
+from django.urls import reverse
+from .ext_test_case import ExtTestCase
+from tasks.models import Project, Priority, Phase, Task
+
+PHASE_NAMES = ['pending', 'ongoing', 'continuing', 'finished', 'done', 'blocked', 'impediment']
+
+
+class QueryBudgetTest(ExtTestCase):
+    """ Number of queries in views must not depend on the number of tasks """
+    def setUp(self):
+        super(QueryBudgetTest, self).setUp()
+        self.create_default_phases()
+        self.user = self.create_and_log_in_user()
+        owner = User.objects.create(username='owner')
+        priority = Priority.objects.create(name='normal', title='Normal')
+        self.project = Project.objects.create(name='test_project', title='Test project', created_by=self.user)
+        for i in range(0, 30):
+            phase = Phase.objects.get(name=PHASE_NAMES[i % len(PHASE_NAMES)])
+            self.task = Task.objects.create(project=self.project, name='task_%d' % i, title='Task %d' % i,
+                                            order=i, work_left=i % 3, phase=phase, owner=owner,
+                                            priority=priority, created_by=owner)
+        self.client.get(reverse('tasks:projects'))  # Load phases and session
+
+    def test_project_list(self):
+        with self.assertMaxQueries(4):
+            self.client.get(reverse('tasks:projects'))
+
+    def test_project_list_weekly(self):
+        with self.assertMaxQueries(6):
+            self.client.get(reverse('tasks:projects_weekly'))
+
+    def test_project_detail(self):
+        for tab in ['table', 'chart', 'archive']:
+            with self.assertMaxQueries(5):
+                self.client.get(reverse('tasks:project_tab', args=[self.project.name, tab]))
+
+    def test_project_weekly(self):
+        with self.assertMaxQueries(6):
+            self.client.get(reverse('tasks:project_weekly', args=[self.project.name]))
+
+    def test_not_modified(self):
+        urls = [reverse('tasks:projects'), reverse('tasks:projects_weekly'),
+                reverse('tasks:project', args=[self.project.name]),
+                reverse('tasks:project_weekly', args=[self.project.name])]
+        for url in urls:
+            etag = self.client.get(url)['ETag']
+            with self.assertMaxQueries(3):  # Session and user on pages that show them, project versions
+                response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+            self.assertEqual(response.status_code, 304)
+
+    def test_api(self):
+        with self.assertMaxQueries(2):
+            self.client.get(reverse('tasks:api_projects'))
+        with self.assertMaxQueries(3):
+            self.client.get(reverse('tasks:api_project_tasks', args=[self.project.name]))
+        with self.assertMaxQueries(2):
+            self.client.get(reverse('tasks:api_task', args=[self.project.name, self.task.name]))
+
+    def test_task_list(self):
+        with self.assertMaxQueries(3):
+            self.client.get(reverse('tasks:tasks'))
+
+    def test_task_detail(self):
+        with self.assertMaxQueries(3):
+            self.client.get(reverse('tasks:task', args=[self.project.name, self.task.name]))
+
+    def test_task_update(self):
+        with self.assertMaxQueries(5):
+            self.client.get(reverse('tasks:task_update', args=[self.project.name, self.task.name]))
+
+    def test_task_delete(self):
+        with self.assertMaxQueries(3):
+            self.client.get(reverse('tasks:task_delete', args=[self.project.name, self.task.name]))
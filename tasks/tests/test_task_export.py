@@ -0,0 +1,84 @@
+import csv
+import json
+from io import StringIO
+from django.contrib.auth.models import User
+from django.urls import reverse
+from .ext_test_case import ExtTestCase
+from tasks.models import Project, Task
+from tasks.task_export import FIELDS, PROJECT_FIELDS, csv_lines, export_rows, project_rows
+from tasks.task_import import import_tasks, parse_csv
+
+
+class ExportTest(ExtTestCase):
+    def setUp(self):
+        super(ExportTest, self).setUp()
+        self.create_default_phases()
+        self.creator = User.objects.create(username='creator')
+        self.project = Project.objects.create(name='test_project', title='Test project', description='Testing',
+                                              created_by=self.creator)
+        self.other_project = Project.objects.create(name='other_project', created_by=self.creator)
+        Task.objects.create(project=self.project, name='task_2', title='Task, "two"', order=2, work_left=2,
+                            owner=self.creator, created_by=self.creator).set_phase('ongoing')
+        Task.objects.create(project=self.project, name='task_1', title='Task 1', description='First', order=1,
+                            created_by=self.creator)
+        Task.objects.create(project=self.other_project, name='other_task', title='Other', created_by=self.creator)
+
+    def content(self, response):
+        return b''.join(response.streaming_content).decode()
+
+    def test_reverse(self):
+        self.assertEqual(reverse('tasks:project_export', args=['test_project', 'csv']),
+                         '/project/test_project/export.csv')
+        self.assertEqual(reverse('tasks:projects_export', args=['jsonl']), '/projects/export.jsonl')
+        self.assertEqual(reverse('tasks:projects_export_projects', args=['csv']), '/projects/export_projects.csv')
+
+    def test_export_rows_in_one_query(self):
+        with self.assertNumQueries(1):
+            rows = list(export_rows())
+        self.assertEqual(rows[0], ('other_project', 'other_task', 'Other', None, 0, None, None, 1, 0))
+        self.assertEqual(rows[2], ('test_project', 'task_2', 'Task, "two"', None, 2, 'ongoing', 'creator', 2, 0))
+
+    def test_project_csv(self):
+        response = self.client.get(reverse('tasks:project_export', args=[self.project.name, 'csv']))
+        self.assertTrue(response.streaming)
+        self.assertEqual(response['Content-Type'], 'text/csv')
+        self.assertEqual(response['Content-Disposition'], 'attachment; filename="test_project.csv"')
+        rows = list(csv.DictReader(StringIO(self.content(response))))
+        self.assertEqual([row['name'] for row in rows], ['task_1', 'task_2'])
+        self.assertEqual(rows[1]['title'], 'Task, "two"')
+        self.assertEqual(rows[0]['description'], 'First')
+        self.assertEqual(rows[1]['phase'], 'ongoing')
+
+    def test_all_projects_jsonl(self):
+        response = self.client.get(reverse('tasks:projects_export', args=['jsonl']))
+        self.assertEqual(response['Content-Type'], 'application/x-ndjson')
+        rows = [json.loads(line) for line in self.content(response).splitlines()]
+        self.assertEqual([row['name'] for row in rows], ['other_task', 'task_1', 'task_2'])
+        self.assertEqual(sorted(rows[0]), sorted(FIELDS))
+
+    def test_project_rows_in_one_query(self):
+        Project.objects.create(name='empty_project', title='No tasks', created_by=self.creator)
+        with self.assertNumQueries(1):
+            rows = list(project_rows())
+        self.assertEqual([row[0] for row in rows], ['empty_project', 'other_project', 'test_project'])
+        self.assertEqual(rows[0], ('empty_project', 'No tasks', None, 'creator', 0, 0))
+        self.assertEqual(rows[2], ('test_project', 'Test project', 'Testing', 'creator', 2, 3))
+
+    def test_project_list_csv(self):
+        response = self.client.get(reverse('tasks:projects_export_projects', args=['csv']))
+        self.assertEqual(response['Content-Disposition'], 'attachment; filename="project_list.csv"')
+        rows = list(csv.DictReader(StringIO(self.content(response))))
+        self.assertEqual(sorted(rows[0]), sorted(PROJECT_FIELDS))
+        self.assertEqual([(row['name'], row['title']) for row in rows],
+                         [('other_project', ''), ('test_project', 'Test project')])
+
+    def test_exported_csv_can_be_imported(self):
+        lines = ''.join(csv_lines(export_rows(self.project.tasks.all())))
+        new_project = Project.objects.create(name='new_project', created_by=self.creator)
+        import_tasks(new_project, parse_csv(StringIO(lines)), self.creator)
+        self.assertEqual(list(new_project.tasks.order_by('order').values_list('title', 'work_left')),
+                         [('Task 1', 1), ('Task, "two"', 2)])
+
+    def test_404_not_found(self):
+        response = self.client.get(reverse('tasks:project_export', args=['missing_project', 'csv']))
+        self.assertEqual(response.status_code, 404)
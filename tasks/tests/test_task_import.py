@@ -0,0 +1,149 @@
+import json
+import os
+import tempfile
+from io import StringIO
+from django.contrib.auth.models import User
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import call_command, CommandError
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from .ext_test_case import ExtTestCase
+from tasks.models import Phase, Project, Task
+from tasks.project_totals import find_mismatches
+from tasks.task_import import TaskImportError, import_tasks, parse_csv, parse_json_lines
+from tasks.task_order import ORDER_GAP
+
+CSV = 'title,description,work_left\nFirst task,Description,3\nSecond task,,1\nFirst task,Same name,2\n'
+
+
+class ImportTasksTest(ExtTestCase):
+    def setUp(self):
+        super(ImportTasksTest, self).setUp()
+        self.create_default_phases()
+        self.creator = User.objects.create(username='creator')
+        self.project = Project.objects.create(name='test_project', created_by=self.creator)
+
+    def test_import_csv(self):
+        Task.objects.create(project=self.project, name='first-task', order=ORDER_GAP, created_by=self.creator)
+        count = import_tasks(self.project, parse_csv(StringIO(CSV)), self.creator)
+        self.assertEqual(count, 3)
+        tasks = list(self.project.tasks.order_by('order'))
+        self.assertEqual([task.name for task in tasks], ['first-task', 'first-task-2', 'second-task', 'first-task-3'])
+        self.assertEqual([task.order for task in tasks], [ORDER_GAP, 2 * ORDER_GAP, 3 * ORDER_GAP, 4 * ORDER_GAP])
+        self.assertEqual(tasks[1].description, 'Description')
+        self.assertEqual(tasks[2].description, None)
+        self.assertEqual(tasks[1].work_left, 3)
+        self.assertEqual(tasks[1].phase.name, 'pending')
+        self.assertEqual(tasks[1].created_by, self.creator)
+        self.assertEqual(find_mismatches(), [])
+        self.assertEqual(Project.objects.get(pk=self.project.pk).work_left_total, 7)
+
+    def test_names_of_other_projects_are_not_taken(self):
+        other_project = Project.objects.create(name='other_project', created_by=self.creator)
+        Task.objects.create(project=other_project, name='first-task', created_by=self.creator)
+        import_tasks(self.project, parse_csv(StringIO(CSV)), self.creator)
+        self.assertEqual(sorted(self.project.tasks.values_list('name', flat=True)),
+                         ['first-task', 'first-task-2', 'second-task'])
+
+    def test_import_json_lines(self):
+        lines = [json.dumps({'title': 'Task %d' % i, 'work_left': i}) for i in range(0, 12)]
+        count = import_tasks(self.project, parse_json_lines(StringIO('\n'.join(lines) + '\n\n')), self.creator,
+                             batch_size=5)
+        self.assertEqual(count, 12)
+        self.assertEqual(self.project.tasks.count(), 12)
+        self.assertEqual(self.project.tasks.order_by('order').last().name, 'task-11')
+
+    def test_query_count_does_not_depend_on_task_count(self):
+        Phase.objects.cached()
+        for task_count in [20, 40]:
+            lines = [json.dumps({'title': 'Task %d of %d' % (i, task_count)}) for i in range(0, task_count)]
+            project = Project.objects.create(name='project_%d' % task_count, created_by=self.creator)
+            with CaptureQueriesContext(connection) as queries:
+                import_tasks(project, parse_json_lines(lines), self.creator)
+            if task_count == 20:
+                first_queries = len(queries)
+        self.assertEqual(len(queries), first_queries)
+
+    def test_name_given_and_truncated(self):
+        lines = [json.dumps({'title': 'Task', 'name': 'custom'}), json.dumps({'title': 'x' * 200}),
+                 json.dumps({'title': 'x' * 200})]
+        import_tasks(self.project, parse_json_lines(lines), self.creator)
+        names = list(self.project.tasks.order_by('order').values_list('name', flat=True))
+        self.assertEqual(names, ['custom', 'x' * 100, 'x' * 98 + '-2'])
+
+    def test_invalid_row_imports_nothing(self):
+        lines = [json.dumps({'title': 'Task %d' % i}) for i in range(0, 10)] + [json.dumps({'title': ''})]
+        with self.assertRaises(TaskImportError):
+            import_tasks(self.project, parse_json_lines(lines), self.creator, batch_size=3)
+        with self.assertRaises(TaskImportError):
+            import_tasks(self.project, parse_json_lines(['{"title": "Task", "work_left": "many"}']), self.creator)
+        with self.assertRaises(TaskImportError):
+            import_tasks(self.project, parse_json_lines(['not json']), self.creator)
+        self.assertEqual(self.project.tasks.count(), 0)
+
+    def test_values_database_would_not_accept(self):
+        for row in [{'title': 5}, {'title': 'x' * 251}, {'title': 'Task', 'work_left': 32768},
+                    {'title': 'Task', 'work_left': -1}, {'title': 'Task', 'work_left': 1.5},
+                    {'title': 'Task', 'work_left': True}, {'title': 'Task', 'description': ['list']},
+                    {'title': 'Task', 'name': 5}]:
+            with self.assertRaises(TaskImportError):
+                import_tasks(self.project, parse_json_lines([json.dumps(row)]), self.creator)
+        self.assertEqual(self.project.tasks.count(), 0)
+
+    def test_work_left_defaults_to_task_default(self):
+        import_tasks(self.project, parse_json_lines([json.dumps({'title': 'Task'})]), self.creator)
+        self.assertEqual(self.project.tasks.get().work_left, Task._meta.get_field('work_left').default)
+
+    def test_command(self):
+        with tempfile.NamedTemporaryFile('w', suffix='.csv', delete=False) as csv_file:
+            csv_file.write(CSV)
+        try:
+            out = StringIO()
+            call_command('import_tasks', self.project.name, csv_file.name, stdout=out)
+            self.assertIn('Imported 3 task(s) to test_project', out.getvalue())
+            with self.assertRaises(CommandError):
+                call_command('import_tasks', 'missing_project', csv_file.name, stdout=StringIO())
+            with self.assertRaises(CommandError):
+                call_command('import_tasks', self.project.name, csv_file.name, '--user', 'missing', stdout=StringIO())
+        finally:
+            os.remove(csv_file.name)
+
+
+class ImportTasksViewTest(ExtTestCase):
+    def setUp(self):
+        super(ImportTasksViewTest, self).setUp()
+        self.create_default_phases()
+        self.creator = self.create_and_log_in_user()
+        self.project = Project.objects.create(name='test_project', created_by=self.creator)
+        self.url = reverse('tasks:task_import', args=[self.project.name])
+
+    def test_reverse(self):
+        self.assertEqual(self.url, '/project/test_project/import/')
+
+    def test_upload_file(self):
+        upload = SimpleUploadedFile('tasks.csv', CSV.encode())
+        response = self.client.post(self.url, {'file': upload})
+        self.assertEqual(response.json(), {'imported': 3})
+        self.assertEqual(self.project.tasks.count(), 3)
+
+    def test_post_body(self):
+        response = self.client.post(self.url + '?format=jsonl', '{"title": "Task"}\n',
+                                    content_type='application/x-ndjson')
+        self.assertEqual(response.json(), {'imported': 1})
+
+    def test_invalid_input(self):
+        response = self.client.post(self.url + '?format=jsonl', '{"title": ""}\n', content_type='application/x-ndjson')
+        self.assertEqual(response.status_code, 400)
+        response = self.client.post(self.url + '?format=jsonl', '{"title": 5}\n', content_type='application/x-ndjson')
+        self.assertEqual(response.status_code, 400)
+        response = self.client.post(self.url + '?format=xml', '', content_type='application/xml')
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(self.project.tasks.count(), 0)
+
+    def test_cant_import_if_not_creator(self):
+        self.project.created_by = User.objects.create(username='other')
+        self.project.save()
+        response = self.client.post(self.url, {'file': SimpleUploadedFile('tasks.csv', CSV.encode())})
+        self.assertEqual(response.status_code, 404)
+        self.assertEqual(self.project.tasks.count(), 0)
@@ -0,0 +1,131 @@
+from io import StringIO
+from django.contrib.auth.models import User
+from django.core.management import call_command, CommandError
+from django.urls import reverse
+from .ext_test_case import ExtTestCase
+from tasks.models import Project, Task
+from tasks.task_order import ORDER_GAP, MAX_ORDER, append_order, move_to, reorder_tasks
+
+
+class TaskOrderTest(ExtTestCase):
+    def setUp(self):
+        super(TaskOrderTest, self).setUp()
+        self.creator = User.objects.create(username='creator')
+        self.project = Project.objects.create(name='test_project', created_by=self.creator)
+        self.tasks = [Task.objects.create(project=self.project, order=(i + 1) * ORDER_GAP, name='task_%d' % i,
+                                          created_by=self.creator) for i in range(0, 5)]
+
+    def names(self):
+        return list(self.project.tasks.order_by('order').values_list('name', flat=True))
+
+    def orders(self):
+        return list(self.project.tasks.order_by('order').values_list('order', flat=True))
+
+    def test_reorder_tasks(self):
+        new_order = [self.tasks[i].pk for i in [4, 2, 0, 1, 3]]
+        self.assertEqual(reorder_tasks(self.project, new_order), 5)
+        self.assertEqual(self.names(), ['task_4', 'task_2', 'task_0', 'task_1', 'task_3'])
+        self.assertEqual(self.orders(), [ORDER_GAP, 2 * ORDER_GAP, 3 * ORDER_GAP, 4 * ORDER_GAP, 5 * ORDER_GAP])
+
+    def test_reorder_tasks_requires_every_task_once(self):
+        with self.assertRaises(ValueError):
+            reorder_tasks(self.project, [task.pk for task in self.tasks[1:]])
+        with self.assertRaises(ValueError):
+            reorder_tasks(self.project, [task.pk for task in self.tasks[1:]] + [self.tasks[1].pk])
+        self.assertEqual(self.names(), ['task_0', 'task_1', 'task_2', 'task_3', 'task_4'])
+
+    def test_move_to_updates_only_moved_task(self):
+        self.assertTrue(move_to(self.tasks[4], 1))
+        self.assertEqual(self.tasks[4].order, ORDER_GAP + ORDER_GAP // 2)
+        self.assertEqual(self.names(), ['task_0', 'task_4', 'task_1', 'task_2', 'task_3'])
+        self.assertEqual(self.orders(), [ORDER_GAP, ORDER_GAP + ORDER_GAP // 2, 2 * ORDER_GAP, 3 * ORDER_GAP,
+                                         4 * ORDER_GAP])
+        self.assertTrue(self.tasks[0].move_to(100))
+        self.assertEqual(self.names(), ['task_4', 'task_1', 'task_2', 'task_3', 'task_0'])
+        self.assertEqual(self.tasks[0].order, 5 * ORDER_GAP)
+        self.assertFalse(self.tasks[0].move_to(4))
+        self.assertFalse(self.tasks[4].move_to(0))
+
+    def test_move_to_rebalances_when_there_is_no_room(self):
+        for i, task in enumerate(self.tasks):
+            Task.objects.filter(pk=task.pk).update(order=i)
+        move_to(self.tasks[4], 1)
+        self.assertEqual(self.names(), ['task_0', 'task_4', 'task_1', 'task_2', 'task_3'])
+        self.assertEqual(self.orders(), [ORDER_GAP, 2 * ORDER_GAP, 3 * ORDER_GAP, 4 * ORDER_GAP, 5 * ORDER_GAP])
+        self.assertEqual(self.tasks[4].order, 2 * ORDER_GAP)
+
+    def test_query_count_does_not_depend_on_distance(self):
+        with self.assertNumQueries(7):  # Savepoint, lock, task, neighbours, update, version and release
+            move_to(self.tasks[4], 0)
+        for i in range(5, 50):
+            Task.objects.create(project=self.project, order=(i + 1) * ORDER_GAP, name='task_%d' % i,
+                                created_by=self.creator)
+        with self.assertNumQueries(7):
+            move_to(self.tasks[0], 45)
+
+    def test_move_increments_version(self):
+        version = Project.objects.get(pk=self.project.pk).version
+        self.tasks[1].move_up()
+        self.assertEqual(Project.objects.get(pk=self.project.pk).version, version + 1)
+
+    def test_move_up_and_down_with_same_order(self):
+        Task.objects.filter(pk=self.tasks[2].pk).update(order=2 * ORDER_GAP)
+        task = Task.objects.get(pk=self.tasks[2].pk)
+        self.assertTrue(task.move_up())
+        self.assertEqual(self.names(), ['task_0', 'task_2', 'task_1', 'task_3', 'task_4'])
+        self.assertTrue(task.move_down())
+        self.assertEqual(self.names(), ['task_0', 'task_1', 'task_2', 'task_3', 'task_4'])
+        self.assertFalse(self.tasks[4].move_down())
+        self.assertFalse(self.tasks[0].move_up())
+
+    def test_append_order(self):
+        self.assertEqual(append_order(self.project), 6 * ORDER_GAP)
+        other_project = Project.objects.create(name='other_project', created_by=self.creator)
+        self.assertEqual(append_order(other_project), ORDER_GAP)
+        Task.objects.filter(pk=self.tasks[4].pk).update(order=MAX_ORDER - 1)
+        self.assertEqual(append_order(self.project), 6 * ORDER_GAP)
+        self.assertEqual(self.orders()[-1], 5 * ORDER_GAP)
+
+    def test_rebalance_command(self):
+        Task.objects.filter(pk=self.tasks[1].pk).update(order=ORDER_GAP + 1)
+        out = StringIO()
+        call_command('rebalance_task_orders', stdout=out)
+        self.assertIn('Changed order of 1 task(s)', out.getvalue())
+        self.assertEqual(self.orders(), [ORDER_GAP, 2 * ORDER_GAP, 3 * ORDER_GAP, 4 * ORDER_GAP, 5 * ORDER_GAP])
+        with self.assertRaises(CommandError):
+            call_command('rebalance_task_orders', 'missing_project', stdout=StringIO())
+
+
+class TaskReorderViewTest(ExtTestCase):
+    def setUp(self):
+        super(TaskReorderViewTest, self).setUp()
+        self.creator = self.create_and_log_in_user()
+        self.project = Project.objects.create(name='test_project', created_by=self.creator)
+        for i in range(0, 3):
+            Task.objects.create(project=self.project, order=i, name='task_%d' % i, created_by=self.creator)
+        self.url = reverse('tasks:task_reorder', args=[self.project.name])
+
+    def test_reverse(self):
+        self.assertEqual(self.url, '/project/test_project/reorder/')
+
+    def test_reorder(self):
+        response = self.client.post(self.url, {'tasks': ['task_2', 'task_0', 'task_1']})
+        self.assertRedirects(response, self.project.get_absolute_url())
+        self.assertEqual(list(self.project.tasks.order_by('order').values_list('name', flat=True)),
+                         ['task_2', 'task_0', 'task_1'])
+
+    def test_missing_task(self):
+        response = self.client.post(self.url, {'tasks': ['task_2', 'task_0']})
+        self.assertEqual(response.status_code, 400)
+
+    def test_cant_reorder_if_not_creator(self):
+        self.project.created_by = User.objects.create(username='other')
+        self.project.save()
+        response = self.client.post(self.url, {'tasks': ['task_2', 'task_0', 'task_1']})
+        self.assertEqual(response.status_code, 404)
+
+    def test_move_to_position(self):
+        response = self.client.get(reverse('tasks:task_move', args=[self.project.name, 'task_2', '0']))
+        self.assertRedirects(response, self.project.get_absolute_url())
+        self.assertEqual(list(self.project.tasks.order_by('order').values_list('name', flat=True)),
+                         ['task_2', 'task_0', 'task_1'])
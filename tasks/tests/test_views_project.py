@@ -1,7 +1,10 @@
+from django.db import connection
 from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
 from django.urls import reverse
+from django.utils.http import http_date
 from django.contrib.auth.models import User
-from tasks.models import Project, Task
+from tasks.models import Phase, Project, Task
 from .ext_test_case import ExtTestCase
 
 
@@ -104,6 +107,33 @@ class ProjectPageTest(TestCase):
         response = self.client.get(reverse('tasks:project', args=['missing_project']))
         self.assertTemplateUsed(response, '404.html')
 
+    def test_chart_query_count_does_not_depend_on_task_count(self):
+        creator = User.objects.create(username='creator')
+        project = Project.objects.create(name='test_project', title='Test project', created_by=creator)
+        Task.objects.create(project=project, created_by=creator, name='task_0', title='Task 0', work_left=2)
+        url = reverse('tasks:project_tab', args=[project.name, 'chart'])
+        with CaptureQueriesContext(connection) as one_task:
+            response = self.client.get(url)
+        self.assertContains(response, 'Task 0')
+        for i in range(1, 30):
+            Task.objects.create(project=project, created_by=creator, order=i, name='task_%d' % i,
+                                title='Task %d' % i, work_left=1)
+        with CaptureQueriesContext(connection) as many_tasks:
+            response = self.client.get(url)
+        self.assertContains(response, 'Task 29')
+        self.assertEqual(len(many_tasks), len(one_task))
+
+    def test_chart_bars_span_days(self):
+        creator = User.objects.create(username='creator')
+        project = Project.objects.create(name='test_project', title='Test project', created_by=creator)
+        Task.objects.create(project=project, created_by=creator, name='task_0', title='Task 0', work_left=4)
+        url = reverse('tasks:project_tab', args=[project.name, 'chart'])
+        response = self.client.get(url)
+        self.assertContains(response, '<td class="day-marker green" colspan="4">', count=1)
+        response = self.client.get(url + '?day_cells=1')
+        self.assertEqual(response.context['day_cells'], '1')
+        self.assertContains(response, '<td class="day-marker green">', count=4)
+
 
 class ProjectWeeklyReportTest(TestCase):
     def test_reverse(self):
@@ -287,3 +317,168 @@ class DeleteProjectPageTest(ExtTestCase):
         self.assertEqual(Project.objects.all().count(), 1)
         self.assertEqual(Task.objects.all().count(), 1)
         self.assertTemplateUsed(response, '404.html')
+
+
+class ProjectWeeklyReportCacheTest(ExtTestCase):
+    def setUp(self):
+        super(ProjectWeeklyReportCacheTest, self).setUp()
+        self.create_default_phases()
+        self.creator = User.objects.create(username='creator')
+        self.project = Project.objects.create(name='test_project', title='Test project', created_by=self.creator)
+        self.other_project = Project.objects.create(name='other_project', title='Other project',
+                                                    created_by=self.creator)
+        self.task = Task.objects.create(project=self.project, name='task_1', title='Old title', work_left=1,
+                                        created_by=self.creator)
+        self.task.set_phase('ongoing')
+        Task.objects.create(project=self.other_project, name='task_2', title='Other task', work_left=1,
+                            created_by=self.creator).set_phase('ongoing')
+
+    def test_second_render_uses_cached_fragment(self):
+        url = reverse('tasks:project_weekly', args=[self.project.name])
+        with CaptureQueriesContext(connection) as first:
+            self.client.get(url)
+        with CaptureQueriesContext(connection) as second:
+            response = self.client.get(url)
+        self.assertContains(response, 'Old title')
+        self.assertLess(len(second), len(first))
+
+    def test_editing_task_invalidates_only_its_project(self):
+        self.client.get(reverse('tasks:projects_weekly'))
+        version = Project.objects.get(pk=self.project.pk).version
+        other_version = Project.objects.get(pk=self.other_project.pk).version
+        self.task.title = 'New title'
+        self.task.save()
+        self.assertEqual(Project.objects.get(pk=self.project.pk).version, version + 1)
+        self.assertEqual(Project.objects.get(pk=self.other_project.pk).version, other_version)
+        response = self.client.get(reverse('tasks:projects_weekly'))
+        self.assertContains(response, 'New title')
+        self.assertNotContains(response, 'Old title')
+        self.assertContains(response, 'Other task')
+
+    def test_saving_project_invalidates_fragment(self):
+        url = reverse('tasks:project_weekly', args=[self.project.name])
+        self.client.get(url)
+        project = Project.objects.get(pk=self.project.pk)
+        project.description = 'Updated description'
+        project.save()
+        self.assertEqual(Project.objects.get(pk=self.project.pk).version, project.version)
+        self.assertContains(self.client.get(url), 'Updated description')
+
+    def test_hidden_parts_are_cached_separately(self):
+        url = reverse('tasks:project_weekly', args=[self.project.name])
+        self.client.get(url + '?hide_text=1')
+        self.assertContains(self.client.get(url), 'Old title')
+
+    def test_any_flag_value_uses_same_cached_fragment(self):
+        url = reverse('tasks:project_weekly', args=[self.project.name])
+        with CaptureQueriesContext(connection) as first:
+            self.client.get(url + '?hide_chart=1')
+        with CaptureQueriesContext(connection) as second:
+            response = self.client.get(url + '?hide_chart=other-value')
+        self.assertEqual(response.context['hide_chart'], '1')
+        self.assertLess(len(second), len(first))
+
+
+class ProjectConditionalGetTest(ExtTestCase):
+    def setUp(self):
+        super(ProjectConditionalGetTest, self).setUp()
+        self.create_default_phases()
+        self.creator = User.objects.create(username='creator')
+        self.project = Project.objects.create(name='test_project', title='Test project', created_by=self.creator)
+        self.other_project = Project.objects.create(name='other_project', title='Other project',
+                                                    created_by=self.creator)
+        self.task = Task.objects.create(project=self.project, name='task_1', title='Task 1', work_left=1,
+                                        created_by=self.creator)
+        self.url = reverse('tasks:project', args=[self.project.name])
+
+    def assertModified(self, url, etag, modified=True):
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200 if modified else 304)
+        return response
+
+    def test_not_modified(self):
+        for url in [self.url, reverse('tasks:project_tab', args=[self.project.name, 'chart']),
+                    reverse('tasks:project_weekly', args=[self.project.name]),
+                    reverse('tasks:projects'), reverse('tasks:projects_weekly')]:
+            response = self.client.get(url)
+            self.assertIn('no-cache', response['Cache-Control'])
+            self.assertModified(url, response['ETag'], modified=False)
+
+    def test_task_changes(self):
+        etag = self.client.get(self.url)['ETag']
+        self.task.work_left = 2
+        self.task.save()
+        etag = self.assertModified(self.url, etag)['ETag']
+        self.assertModified(self.url, etag, modified=False)
+        self.task.delete()
+        self.assertModified(self.url, etag)
+
+    def test_other_project_changes(self):
+        etag = self.client.get(self.url)['ETag']
+        list_etag = self.client.get(reverse('tasks:projects'))['ETag']
+        Task.objects.create(project=self.other_project, name='task_2', work_left=1, created_by=self.creator)
+        self.assertModified(self.url, etag, modified=False)
+        self.assertModified(reverse('tasks:projects'), list_etag)
+
+    def test_log_in_changes(self):
+        etag = self.client.get(self.url)['ETag']
+        self.create_and_log_in_user()
+        self.assertModified(self.url, etag)
+
+    def test_phase_changes(self):
+        etag = self.client.get(reverse('tasks:projects'))['ETag']
+        Phase.objects.filter(name='blocked').delete()
+        self.assertModified(reverse('tasks:projects'), etag)
+
+    def test_no_last_modified(self):
+        # Deleting a task does not change any edited time, so If-Modified-Since must not give 304
+        response = self.client.get(self.url)
+        self.assertNotIn('Last-Modified', response)
+        self.task.delete()
+        response = self.client.get(self.url, HTTP_IF_MODIFIED_SINCE=http_date())
+        self.assertEqual(response.status_code, 200)
+
+    def test_404_not_found(self):
+        response = self.client.get(reverse('tasks:project', args=['missing_project']), HTTP_IF_NONE_MATCH='*')
+        self.assertEqual(response.status_code, 404)
+
+
+class ProjectChartSvgTest(ExtTestCase):
+    def setUp(self):
+        super(ProjectChartSvgTest, self).setUp()
+        self.create_default_phases()
+        self.creator = User.objects.create(username='creator')
+        self.project = Project.objects.create(name='test_project', title='Test project', created_by=self.creator)
+        self.task = Task.objects.create(project=self.project, created_by=self.creator, name='task_0',
+                                        title='Task <0>', work_left=4)
+        self.task.set_phase('blocked')
+        Task.objects.create(project=self.project, created_by=self.creator, order=1, name='task_1',
+                            title='Task 1', work_left=12)
+        self.url = reverse('tasks:project_chart_svg', args=[self.project.name])
+
+    def test_reverse(self):
+        self.assertEqual(self.url, '/project/test_project/chart.svg')
+
+    def test_svg(self):
+        response = self.client.get(self.url)
+        self.assertEqual(response['Content-Type'], 'image/svg+xml')
+        self.assertContains(response, '<svg ')
+        self.assertContains(response, '<rect ', count=2)
+        self.assertContains(response, 'width="24" height="12" fill="red"')
+        self.assertContains(response, 'Task &lt;0&gt;')
+        self.assertContains(response, 'Total: 3 week(s), 1 day(s)')
+
+    def test_not_modified(self):
+        response = self.client.get(self.url)
+        etag = response['ETag']
+        response = self.client.get(self.url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+        self.task.work_left = 1
+        self.task.save()
+        response = self.client.get(self.url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response['ETag'], etag)
+
+    def test_404_not_found(self):
+        response = self.client.get(reverse('tasks:project_chart_svg', args=['missing_project']))
+        self.assertEqual(response.status_code, 404)
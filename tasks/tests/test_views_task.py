@@ -1,7 +1,11 @@
+from django.db import connection
 from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
 from django.urls import reverse
 from django.contrib.auth.models import User
+from tasks.keyset import encode_cursor
 from tasks.models import Project, Task, Phase
+from tasks.task_order import ORDER_GAP
 from .ext_test_case import ExtTestCase
 
 
@@ -22,15 +26,75 @@ class TaskListTest(TestCase):
         creator = User.objects.create(username='creator')
         project = Project.objects.create(name='test_project', title='Test project', created_by=creator)
         response = self.client.get(reverse('tasks:tasks'))
-        self.assertEqual(response.context['task_list'].count(), 0)
+        self.assertEqual(len(response.context['task_list']), 0)
         task = Task.objects.create(project=project, name='test_task', title='Test task', created_by=creator)
         response = self.client.get(reverse('tasks:tasks'))
-        self.assertEqual(response.context['task_list'].count(), 1)
+        self.assertEqual(len(response.context['task_list']), 1)
         self.assertEqual(response.context['task_list'][0], task)
         self.assertContains(response, task.title)
         Task.objects.create(project=project, name='test_task_2', created_by=creator)
         response = self.client.get(reverse('tasks:tasks'))
-        self.assertEqual(response.context['task_list'].count(), 2)
+        self.assertEqual(len(response.context['task_list']), 2)
+
+
+class TaskListPaginationTest(TestCase):
+    def setUp(self):
+        creator = User.objects.create(username='creator')
+        project = Project.objects.create(name='test_project', title='Test project', created_by=creator)
+        # Same order and title in several tasks, so only id tells them apart
+        for i in range(0, 7):
+            Task.objects.create(project=project, name='task_%d' % i, title='Task %d' % (i // 3), order=i // 2,
+                                created_by=creator)
+        self.expected = list(Task.objects.order_by('order', 'title', 'id'))
+
+    def test_pages(self):
+        url = reverse('tasks:tasks') + '?page_size=3'
+        tasks = []
+        while url:
+            response = self.client.get(url)
+            self.assertLessEqual(len(response.context['task_list']), 3)
+            tasks += response.context['task_list']
+            url = response.context['next_url']
+        self.assertEqual(tasks, self.expected)
+
+    def test_no_next_page_after_last_row(self):
+        response = self.client.get(reverse('tasks:tasks'), {'page_size': 7})
+        self.assertEqual(len(response.context['task_list']), 7)
+        self.assertIsNone(response.context['next_url'])
+        self.assertNotContains(response, 'class="more"')
+
+    def test_load_more_fragment(self):
+        response = self.client.get(reverse('tasks:tasks'), {'page_size': 2})
+        self.assertContains(response, '<a href="/tasks/?after=')
+        more_url = response.context['more_url']
+        self.assertTrue(more_url.startswith(reverse('tasks:tasks_more')))
+        self.assertContains(response, 'data-more-url="%s"' % more_url.replace('&', '&amp;'))
+        response = self.client.get(more_url)
+        self.assertTemplateUsed(response, 'tasks/task_list_rows.html')
+        self.assertTemplateNotUsed(response, 'tasks/tasks_base.html')
+        self.assertEqual(list(response.context['task_list']), self.expected[2:4])
+        # Link of fragment still opens the next full page if rows can not be loaded into the page
+        self.assertContains(response, '<a href="/tasks/?after=')
+        self.assertContains(response, 'data-more-url="/tasks/more/?after=')
+        self.assertContains(response, 'Test project')
+
+    def test_page_size_is_limited(self):
+        response = self.client.get(reverse('tasks:tasks'), {'page_size': 'all'})
+        self.assertEqual(len(response.context['task_list']), 7)
+        response = self.client.get(reverse('tasks:tasks'), {'page_size': '1000000'})
+        self.assertEqual(len(response.context['task_list']), 7)
+
+    def test_invalid_cursor(self):
+        # Not base64, [1], {"a": 1}, ["x", "y", "z"], [null, "a", 1]
+        for cursor in ['not base64', 'WzFd', 'eyJhIjogMX0=', encode_cursor(['x', 'y', 'z']),
+                       encode_cursor([None, 'a', 1])]:
+            response = self.client.get(reverse('tasks:tasks'), {'after': cursor})
+            self.assertEqual(response.status_code, 404)
+
+    def test_query_count_does_not_depend_on_position(self):
+        response = self.client.get(reverse('tasks:tasks'), {'page_size': 2})
+        with self.assertNumQueries(1):
+            self.client.get(response.context['next_url'])
 
 
 class TaskPageTest(TestCase):
@@ -98,7 +162,7 @@ class CreateTaskTest(ExtTestCase):
         self.assertEqual(task.title, 'Test task')
         self.assertEqual(task.description, 'For testing')
         self.assertEqual(task.work_left, 5)
-        self.assertEqual(task.order, 0)
+        self.assertEqual(task.order, ORDER_GAP)
         self.assertEqual(task.phase, None)
         self.assertEqual(task.created_by, creator)
         self.assertTemplateUsed(response, 'tasks/project_detail.html')
@@ -111,19 +175,19 @@ class CreateTaskTest(ExtTestCase):
                                      'description': '',
                                      'work_left': '1'}, follow=True)
         self.assertEqual(Task.objects.all().count(), 1)
-        self.assertEqual(Task.objects.first().order, 0)
+        self.assertEqual(Task.objects.first().order, ORDER_GAP)
         response = self.client.post(reverse('tasks:task_create', args=[project.name]),
                                     {'title': 'Test task 2',
                                      'description': '',
                                      'work_left': '1'}, follow=True)
         self.assertEqual(Task.objects.all().count(), 2)
-        self.assertEqual(Task.objects.last().order, 1)
+        self.assertEqual(Task.objects.last().order, 2 * ORDER_GAP)
         response = self.client.post(reverse('tasks:task_create', args=[project.name]),
                                 {'title': 'Test task 3',
                                  'description': '',
                                  'work_left': '1'}, follow=True)
         self.assertEqual(Task.objects.all().count(), 3)
-        self.assertEqual(Task.objects.last().order, 2)
+        self.assertEqual(Task.objects.last().order, 3 * ORDER_GAP)
 
     def test_order_is_higher_than_previous_highest_order_task(self):
         creator = self.create_and_log_in_user()
@@ -135,7 +199,7 @@ class CreateTaskTest(ExtTestCase):
                                      'work_left': '1'}, follow=True)
         self.assertEqual(Task.objects.all().count(), 2)
         self.assertEqual(Task.objects.all()[0].order, 1336)
-        self.assertEqual(Task.objects.all()[1].order, 1337)
+        self.assertEqual(Task.objects.all()[1].order, 1336 + ORDER_GAP)
 
     def test_initial_phase_set_to_pending(self):
         self.create_default_phases()
@@ -259,6 +323,55 @@ class UpdateTaskTest(ExtTestCase):
         self.assertTemplateUsed(response, 'tasks/task_detail.html')
 
 
+class SameTaskNameInProjectsTest(ExtTestCase):
+    def setUp(self):
+        super(SameTaskNameInProjectsTest, self).setUp()
+        self.create_default_phases()
+        self.creator = self.create_and_log_in_user()
+        self.projects = []
+        for name in ['first_project', 'second_project']:
+            project = Project.objects.create(created_by=self.creator, name=name)
+            Task.objects.create(project=project, created_by=self.creator, name='release', title='Release %s' % name,
+                                order=2, phase=Phase.objects.get(name='pending'))
+            Task.objects.create(project=project, created_by=self.creator, name='design', order=1)
+            self.projects.append(project)
+
+    def task(self, project):
+        return Task.objects.get(project=project, name='release')
+
+    def test_task_page(self):
+        for project in self.projects:
+            response = self.client.get(reverse('tasks:task', args=[project.name, 'release']))
+            self.assertEqual(response.context['task'], self.task(project))
+            self.assertEqual(response.context['task'].project, project)
+        response = self.client.get(reverse('tasks:task_update', args=['second_project', 'release']))
+        self.assertEqual(response.context['task'], self.task(self.projects[1]))
+
+    def test_task_of_other_project_not_found(self):
+        Project.objects.create(created_by=self.creator, name='third_project')
+        for url_name in ['task', 'task_update', 'task_delete']:
+            response = self.client.get(reverse('tasks:%s' % url_name, args=['third_project', 'release']))
+            self.assertEqual(response.status_code, 404)
+        response = self.client.get(reverse('tasks:task_move', args=['third_project', 'release', 'up']))
+        self.assertEqual(response.status_code, 404)
+
+    def test_set_phase_and_move_change_task_of_project_in_url(self):
+        self.client.get(reverse('tasks:task_set_phase_to', args=['second_project', 'release', 'ongoing']))
+        self.client.get(reverse('tasks:task_move', args=['second_project', 'release', 'up']))
+        self.assertEqual(self.task(self.projects[0]).phase.name, 'pending')
+        self.assertEqual(self.task(self.projects[1]).phase.name, 'ongoing')
+        self.assertEqual(self.projects[0].tasks.order_by('order').first().name, 'design')
+        self.assertEqual(self.projects[1].tasks.order_by('order').first().name, 'release')
+
+    def test_task_and_project_fetched_in_one_query(self):
+        self.client.get(reverse('tasks:projects'))  # Load session and phases
+        with CaptureQueriesContext(connection) as queries:
+            self.client.get(reverse('tasks:task_set_phase_to', args=['first_project', 'design', 'ongoing']))
+        task_queries = [query['sql'] for query in queries if 'FROM "tasks_task"' in query['sql']]
+        self.assertIn('INNER JOIN "tasks_project"', task_queries[0])
+        self.assertFalse([query for query in queries if query['sql'].startswith('SELECT "tasks_project"')])
+
+
 class MoveTaskTest(ExtTestCase):
     def test_reverse_task_move(self):
         self.assertEqual(reverse('tasks:task_move', args=['test_project', 'test_task', 'up']),
@@ -274,8 +387,7 @@ class MoveTaskTest(ExtTestCase):
         self.assertTemplateUsed(response, 'tasks/project_detail.html')
         task_1 = Task.objects.get(project=project, name="task_1")
         task_2 = Task.objects.get(project=project, name="task_2")
-        self.assertEqual(task_1.order, 2)
-        self.assertEqual(task_2.order, 1)
+        self.assertLess(task_2.order, task_1.order)
         self.assertEqual(task_2.next, task_1)
 
     def test_move_task_down(self):
@@ -288,8 +400,7 @@ class MoveTaskTest(ExtTestCase):
         self.assertTemplateUsed(response, 'tasks/project_detail.html')
         task_1 = Task.objects.get(project=project, name="task_1")
         task_2 = Task.objects.get(project=project, name="task_2")
-        self.assertEqual(task_1.order, 2)
-        self.assertEqual(task_2.order, 1)
+        self.assertLess(task_2.order, task_1.order)
         self.assertEqual(task_2.next, task_1)
 
     def test_cant_move_task_if_not_logged_in(self):
@@ -358,6 +469,80 @@ class UpdateTaskStatusTest(ExtTestCase):
         self.assertEqual(task.work_left, 0)
 
 
+    def test_set_phase_from_continuing_to_finished(self):
+        self.create_default_phases()
+        creator = self.create_and_log_in_user()
+        project = Project.objects.create(created_by=creator, name="test_project")
+        task = Task.objects.create(project=project, created_by=creator, name="task_1", order=1, work_left=5,
+                                   phase=Phase.objects.get(name='continuing'))
+        self.client.get(reverse('tasks:task_set_phase_to', args=[project.name, task.name, 'finished']))
+        task = Task.objects.first()
+        self.assertEqual(task.phase.name, 'finished')
+        self.assertEqual(task.work_left, 0)
+
+    def test_cant_skip_phase(self):
+        self.create_default_phases()
+        creator = self.create_and_log_in_user()
+        project = Project.objects.create(created_by=creator, name="test_project")
+        task = Task.objects.create(project=project, created_by=creator, name="task_1", order=1, work_left=5,
+                                   phase=Phase.objects.get(name='pending'))
+        self.client.get(reverse('tasks:task_set_phase_to', args=[project.name, task.name, 'done']))
+        self.assertEqual(Task.objects.first().phase.name, 'pending')
+
+
+class SetPhasesTest(ExtTestCase):
+    def setUp(self):
+        super(SetPhasesTest, self).setUp()
+        self.create_default_phases()
+        self.creator = self.create_and_log_in_user()
+        self.project = Project.objects.create(created_by=self.creator, name="test_project")
+        self.finished = Task.objects.create(project=self.project, created_by=self.creator, name="finished",
+                                            work_left=0, phase=Phase.objects.get(name='finished'))
+        self.ongoing = Task.objects.create(project=self.project, created_by=self.creator, name="ongoing",
+                                           work_left=2, phase=Phase.objects.get(name='ongoing'))
+        self.url = reverse('tasks:task_set_phases', args=[self.project.name])
+
+    def test_reverse(self):
+        self.assertEqual(self.url, '/project/test_project/set_phases/')
+
+    def test_set_phases(self):
+        response = self.client.post(self.url, {'tasks': [self.finished.pk, self.ongoing.pk, 12345],
+                                               'phase': ['done', 'continuing', 'done']})
+        self.assertEqual(response.json(), {'results': {str(self.finished.pk): 'done',
+                                                       str(self.ongoing.pk): 'continuing',
+                                                       '12345': 'Not found'}})
+        self.assertEqual(Task.objects.get(pk=self.finished.pk).phase.name, 'done')
+        self.assertEqual(Task.objects.get(pk=self.ongoing.pk).phase.name, 'continuing')
+
+    def test_one_phase_for_all(self):
+        response = self.client.post(self.url, {'tasks': [self.finished.pk, self.ongoing.pk], 'phase': 'done'})
+        results = response.json()['results']
+        self.assertEqual(results[str(self.finished.pk)], 'done')
+        self.assertEqual(results[str(self.ongoing.pk)], 'Can not move from ongoing to done')
+
+    def test_invalid_input(self):
+        response = self.client.post(self.url, {'tasks': [self.finished.pk, self.ongoing.pk], 'phase': ['done'] * 3})
+        self.assertEqual(response.status_code, 400)
+        response = self.client.post(self.url, {'tasks': [self.finished.pk], 'phase': 'missing'})
+        self.assertEqual(response.json(), {'results': {str(self.finished.pk): 'Tasks can not be moved to phase: missing'}})
+
+    def test_tasks_of_other_projects_not_moved(self):
+        other_project = Project.objects.create(created_by=self.creator, name="other_project")
+        self.ongoing.project = other_project
+        self.ongoing.save()
+        response = self.client.post(self.url, {'tasks': [self.ongoing.pk], 'phase': 'continuing'})
+        self.assertEqual(response.json(), {'results': {str(self.ongoing.pk): 'Not found'}})
+        self.assertEqual(Task.objects.get(pk=self.ongoing.pk).phase.name, 'ongoing')
+
+    def test_cant_set_phases_if_not_creator(self):
+        self.project.created_by = User.objects.create(username='other')
+        self.project.save()
+        response = self.client.post(self.url, {'tasks': [self.ongoing.pk], 'phase': 'finished'})
+        self.assertEqual(response.status_code, 404)
+        ongoing = Task.objects.get(pk=self.ongoing.pk)
+        self.assertEqual((ongoing.phase.name, ongoing.work_left), ('ongoing', 2))
+
+
 class DeleteTaskPageTest(ExtTestCase):
     def test_reverse_blog_delete(self):
         self.assertEqual(reverse('tasks:task_delete', args=['test_project', 'test_task']),
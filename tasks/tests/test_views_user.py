@@ -15,15 +15,36 @@ class UserListTest(ExtTestCase):
 
     def test_default_context(self):
         response = self.client.get(reverse('tasks:users'))
-        self.assertEqual(response.context['user_list'].count(), 0)
+        self.assertEqual(len(response.context['user_list']), 0)
         user_1 = auth.models.User.objects.create(username='user_1')
         response = self.client.get(reverse('tasks:users'))
-        self.assertEqual(response.context['user_list'].count(), 1)
+        self.assertEqual(len(response.context['user_list']), 1)
         self.assertEqual(response.context['user_list'][0], user_1)
         self.assertContains(response, user_1.username)
         user_2 = auth.models.User.objects.create(username='user_2')
         response = self.client.get(reverse('tasks:users'))
-        self.assertEqual(response.context['user_list'].count(), 2)
+        self.assertEqual(len(response.context['user_list']), 2)
+
+    def test_pages(self):
+        for name in ['carol', 'alice', 'dave', 'bob']:
+            auth.models.User.objects.create(username=name)
+        response = self.client.get(reverse('tasks:users'), {'page_size': 3})
+        self.assertEqual([user.username for user in response.context['user_list']], ['alice', 'bob', 'carol'])
+        response = self.client.get(response.context['next_url'])
+        self.assertEqual([user.username for user in response.context['user_list']], ['dave'])
+        self.assertIsNone(response.context['next_url'])
+
+    def test_load_more_fragment(self):
+        for name in ['user_1', 'user_2']:
+            auth.models.User.objects.create(username=name)
+        response = self.client.get(reverse('tasks:users'), {'page_size': 1})
+        self.assertContains(response, 'data-more-url="/users/more/?')
+        response = self.client.get(response.context['more_url'])
+        self.assertEqual([user.username for user in response.context['user_list']], ['user_2'])
+        response = self.client.get(reverse('tasks:users_more'))
+        self.assertTemplateUsed(response, 'auth/user_list_rows.html')
+        self.assertTemplateNotUsed(response, 'tasks/tasks_base.html')
+        self.assertContains(response, '/user/user_1/')
 
 
 class UserPageTest(ExtTestCase):
@@ -0,0 +1,170 @@
+import datetime
+import os
+import shutil
+import tempfile
+from io import StringIO
+from django.contrib.auth.models import User
+from django.core.management import call_command, CommandError
+from django.test import override_settings
+from django.urls import reverse
+from .ext_test_case import ExtTestCase
+from tasks.models import Project, Phase, Task
+from tasks.project_totals import find_mismatches
+from tasks.weekly_report import (is_rolled_over, save_snapshot, snapshot_dir, snapshot_path, snapshot_project_names,
+                                 snapshot_weeks, week_label, weekly_rollover)
+
+DATE = datetime.date(2017, 2, 3)
+
+
+class WeeklyReportTestCase(ExtTestCase):
+    def setUp(self):
+        super(WeeklyReportTestCase, self).setUp()
+        self.snapshot_root = tempfile.mkdtemp()
+        settings_override = override_settings(TASKS_SNAPSHOT_DIR=self.snapshot_root)
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+        self.addCleanup(shutil.rmtree, self.snapshot_root)
+        self.create_default_phases()
+        self.creator = User.objects.create(username='creator')
+        self.project = Project.objects.create(name='test_project', title='Test project', created_by=self.creator)
+        self.other_project = Project.objects.create(name='other_project', title='Other project',
+                                                    created_by=self.creator)
+
+    def create_task(self, project, name, phase_name, work_left=1):
+        return Task.objects.create(project=project, name=name, title=name.replace('_', ' ').capitalize(),
+                                   work_left=work_left, phase=Phase.objects.get_cached(phase_name),
+                                   created_by=self.creator)
+
+    def phase_names(self):
+        return dict(Task.objects.values_list('name', 'phase__name'))
+
+
+class WeeklyRolloverTest(WeeklyReportTestCase):
+    def test_week_label(self):
+        self.assertEqual(week_label(DATE), '2017-W05')
+        self.assertEqual(week_label(datetime.date(2021, 1, 1)), '2020-W53')
+
+    def test_rollover(self):
+        self.create_task(self.project, 'finished_task', 'finished', 0)
+        self.create_task(self.project, 'continuing_task', 'continuing')
+        self.create_task(self.other_project, 'other_finished_task', 'finished', 0)
+        self.create_task(self.other_project, 'ongoing_task', 'ongoing')
+        self.create_task(self.other_project, 'pending_task', 'pending')
+        self.assertEqual(weekly_rollover(DATE), {'done': 2, 'ongoing': 1})
+        self.assertEqual(self.phase_names(), {'finished_task': 'done', 'continuing_task': 'ongoing',
+                                              'other_finished_task': 'done', 'ongoing_task': 'ongoing',
+                                              'pending_task': 'pending'})
+        self.assertEqual(find_mismatches(), [])
+
+        # Snapshot is taken before phases are changed
+        directory = snapshot_dir('2017-W05')
+        with open(os.path.join(directory, 'projects.html'), encoding='utf-8') as report:
+            html = report.read()
+        self.assertIn('Finished task', html)
+        self.assertIn('Other project', html)
+        with open(os.path.join(directory, 'project', 'test_project.html'), encoding='utf-8') as report:
+            html = report.read()
+        self.assertIn('Continuing task', html)
+        self.assertNotIn('Other project', html)
+        self.assertEqual(sorted(os.listdir(self.snapshot_root)), ['2017-W05'])
+
+    def test_rollover_clears_work_left_of_done_tasks(self):
+        self.create_task(self.project, 'finished_task', 'finished', 2)
+        self.create_task(self.project, 'continuing_task', 'continuing', 3)
+        self.assertEqual(weekly_rollover(DATE), {'done': 1, 'ongoing': 1})
+        self.assertEqual(dict(Task.objects.values_list('name', 'work_left')),
+                         {'finished_task': 0, 'continuing_task': 3})
+        self.assertEqual(Project.objects.get(pk=self.project.pk).work_left_total, 3)
+        self.assertEqual(find_mismatches(), [])
+
+    def test_rollover_only_once_per_week(self):
+        self.create_task(self.project, 'finished_task', 'finished', 0)
+        weekly_rollover(DATE)
+        self.create_task(self.project, 'finished_later', 'finished', 0)
+        self.assertIsNone(weekly_rollover(DATE + datetime.timedelta(days=1)))
+        self.assertEqual(self.phase_names()['finished_later'], 'finished')
+        self.assertEqual(weekly_rollover(DATE, force=True), {'done': 1, 'ongoing': 0})
+        self.assertEqual(weekly_rollover(DATE + datetime.timedelta(days=7)), {'done': 0, 'ongoing': 0})
+
+    def test_command(self):
+        self.create_task(self.project, 'finished_task', 'finished', 0)
+        out = StringIO()
+        call_command('weekly_rollover', '--date', '2017-02-03', stdout=out)
+        self.assertIn('Moved 1 task(s) to done and 0 task(s) to ongoing', out.getvalue())
+        out = StringIO()
+        call_command('weekly_rollover', '--date', '2017-02-03', stdout=out)
+        self.assertIn('Week 2017-W05 has already been rolled over', out.getvalue())
+        with self.assertRaises(CommandError):
+            call_command('weekly_rollover', '--date', '3.2.2017', stdout=StringIO())
+
+
+class WeeklySnapshotTest(WeeklyReportTestCase):
+    def test_save_snapshot(self):
+        self.create_task(self.project, 'finished_task', 'finished', 0)
+        self.assertEqual(save_snapshot(DATE), '2017-W05')
+        self.assertEqual(snapshot_weeks(), ['2017-W05'])
+        self.assertEqual(snapshot_project_names('2017-W05'), ['other_project', 'test_project'])
+        self.assertEqual(self.phase_names(), {'finished_task': 'finished'})
+        self.assertIsNone(save_snapshot(DATE))
+        save_snapshot(DATE + datetime.timedelta(days=7))
+        self.assertEqual(snapshot_weeks(), ['2017-W06', '2017-W05'])
+
+    def test_rollover_after_snapshot(self):
+        self.create_task(self.project, 'finished_task', 'finished', 0)
+        save_snapshot(DATE)
+        self.assertFalse(is_rolled_over('2017-W05'))
+        self.assertEqual(weekly_rollover(DATE), {'done': 1, 'ongoing': 0})
+        self.assertTrue(is_rolled_over('2017-W05'))
+        save_snapshot(DATE, force=True)
+        self.assertTrue(is_rolled_over('2017-W05'))
+        self.assertIsNone(weekly_rollover(DATE))
+
+    def test_command(self):
+        out = StringIO()
+        call_command('snapshot_weekly_reports', '--date', '2017-02-03', stdout=out)
+        self.assertIn('Saved weekly reports to', out.getvalue())
+        out = StringIO()
+        call_command('snapshot_weekly_reports', '--date', '2017-02-03', stdout=out)
+        self.assertIn('Snapshot of week 2017-W05 already exists', out.getvalue())
+
+    def test_history_page(self):
+        response = self.client.get(reverse('tasks:weekly_history'))
+        self.assertContains(response, 'No saved weekly reports')
+        save_snapshot(DATE)
+        response = self.client.get(reverse('tasks:weekly_history'))
+        self.assertTemplateUsed(response, 'tasks/weekly_history.html')
+        self.assertEqual(response.context['weeks'], [('2017-W05', ['other_project', 'test_project'])])
+        self.assertContains(response, reverse('tasks:weekly_snapshot_project', args=['2017-W05', 'test_project']))
+
+    def test_serve_snapshot(self):
+        self.create_task(self.project, 'finished_task', 'finished', 0)
+        save_snapshot(DATE)
+        url = reverse('tasks:weekly_snapshot', args=['2017-W05'])
+        self.assertEqual(url, '/weekly/2017-W05/projects.html')
+        with self.assertNumQueries(0):
+            response = self.client.get(url)
+        with open(snapshot_path('2017-W05'), 'rb') as report:
+            self.assertEqual(b''.join(response.streaming_content), report.read())
+        self.assertIn('no-cache', response['Cache-Control'])
+        self.assertNotIn('immutable', response['Cache-Control'])
+        self.assertEqual(self.client.get(url, HTTP_IF_MODIFIED_SINCE=response['Last-Modified']).status_code, 304)
+        self.assertEqual(self.client.get(url, HTTP_IF_NONE_MATCH=response['ETag']).status_code, 304)
+        response = self.client.get(reverse('tasks:weekly_snapshot_project', args=['2017-W05', 'test_project']))
+        self.assertIn(b'Finished task', b''.join(response.streaming_content))
+
+    def test_replaced_snapshot_is_not_cached(self):
+        save_snapshot(DATE)
+        url = reverse('tasks:weekly_snapshot_project', args=['2017-W05', 'test_project'])
+        etag = self.client.get(url)['ETag']
+        self.create_task(self.project, 'finished_task', 'finished', 0)
+        weekly_rollover(DATE)
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertIn(b'Finished task', b''.join(response.streaming_content))
+
+    def test_404_not_found(self):
+        response = self.client.get(reverse('tasks:weekly_snapshot', args=['2017-W05']))
+        self.assertEqual(response.status_code, 404)
+        save_snapshot(DATE)
+        response = self.client.get(reverse('tasks:weekly_snapshot_project', args=['2017-W05', 'missing']))
+        self.assertEqual(response.status_code, 404)
@@ -1,8 +1,9 @@
 from django.conf.urls import url
 from django.contrib.auth.decorators import login_required
 from .tasks_user import TasksUserList, TasksUserDetail, TasksUserRegister, TasksUserUpdate, TasksUserDelete
-from .project import ProjectList, ProjectListWeekly, ProjectDetail, ProjectWeekly, ProjectCreate, ProjectUpdate, ProjectDelete
-from .task import TaskList, TaskDetail, TaskCreate, TaskUpdate, TaskMove, TaskSetPhaseTo, TaskDelete
+from .project import ProjectList, ProjectListWeekly, ProjectDetail, ProjectWeekly, ProjectChartSvg, ProjectExport, ProjectListExport, ProjectListExportProjects, WeeklyHistory, WeeklySnapshot, ProjectCreate, ProjectUpdate, ProjectDelete
+from .api import ApiProjectList, ApiProjectTasks, ApiTask
+from .task import TaskList, TaskDetail, TaskCreate, TaskUpdate, TaskMove, TaskReorder, TaskImport, TaskSetPhaseTo, TaskSetPhases, TaskDelete
 
 app_name = 'tasks'
 
@@ -14,6 +15,9 @@ urlpatterns = [
     url(r'^user/(?P<slug>[\w\.-]+)/$', TasksUserDetail.as_view(), name='user'),
     url(r'^project/create/$', login_required(ProjectCreate.as_view()), name='project_create'),
     url(r'^project/(?P<project_name>[\w\.-]+)/task/create/$', login_required(TaskCreate.as_view()), name='task_create'),
+    url(r'^project/(?P<project_name>[\w\.-]+)/reorder/$', login_required(TaskReorder.as_view()), name='task_reorder'),
+    url(r'^project/(?P<project_name>[\w\.-]+)/import/$', login_required(TaskImport.as_view()), name='task_import'),
+    url(r'^project/(?P<project_name>[\w\.-]+)/set_phases/$', login_required(TaskSetPhases.as_view()), name='task_set_phases'),
     url(r'^project/(?P<project_name>[\w\.-]+)/task/(?P<slug>[\w\.-]+)/set_phase_to/(?P<phase>[\w\.-]+)/$', login_required(TaskSetPhaseTo.as_view()), name='task_set_phase_to'),
     url(r'^project/(?P<project_name>[\w\.-]+)/task/(?P<slug>[\w\.-]+)/move/(?P<dir>[\w\.-]+)/$', login_required(TaskMove.as_view()), name='task_move'),
     url(r'^project/(?P<project_name>[\w\.-]+)/task/(?P<slug>[\w\.-]+)/edit/$', TaskUpdate.as_view(), name='task_update'),
@@ -21,11 +25,23 @@ urlpatterns = [
     url(r'^project/(?P<project_name>[\w\.-]+)/task/(?P<slug>[\w\.-]+)/$', TaskDetail.as_view(), name='task'),
     url(r'^project/(?P<slug>[\w\.-]+)/tab/(?P<tab>[\w\.-]+)/$', ProjectDetail.as_view(), name='project_tab'),
     url(r'^project/(?P<slug>[\w\.-]+)/weekly_report.html$', ProjectWeekly.as_view(), name='project_weekly'),
+    url(r'^project/(?P<slug>[\w\.-]+)/chart.svg$', ProjectChartSvg.as_view(), name='project_chart_svg'),
+    url(r'^project/(?P<slug>[\w\.-]+)/export\.(?P<format>csv|jsonl)$', ProjectExport.as_view(), name='project_export'),
     url(r'^project/(?P<slug>[\w\.-]+)/edit/$', login_required(ProjectUpdate.as_view()), name='project_update'),
     url(r'^project/(?P<slug>[\w\.-]+)/delete/$', login_required(ProjectDelete.as_view()), name='project_delete'),
     url(r'^project/(?P<slug>[\w\.-]+)/$', ProjectDetail.as_view(), name='project'),
     url(r'^projects/weekly/$', ProjectListWeekly.as_view(), name='projects_weekly'),
+    url(r'^projects/export\.(?P<format>csv|jsonl)$', ProjectListExport.as_view(), name='projects_export'),
+    url(r'^projects/export_projects\.(?P<format>csv|jsonl)$', ProjectListExportProjects.as_view(), name='projects_export_projects'),
+    url(r'^weekly/$', WeeklyHistory.as_view(), name='weekly_history'),
+    url(r'^weekly/(?P<week>\d{4}-W\d{2})/projects\.html$', WeeklySnapshot.as_view(), name='weekly_snapshot'),
+    url(r'^weekly/(?P<week>\d{4}-W\d{2})/project/(?P<name>[\w-][\w\.-]*)\.html$', WeeklySnapshot.as_view(), name='weekly_snapshot_project'),
     url(r'^projects/$', ProjectList.as_view(), name='projects'),
+    url(r'^api/projects/$', ApiProjectList.as_view(), name='api_projects'),
+    url(r'^api/project/(?P<slug>[\w\.-]+)/tasks/$', ApiProjectTasks.as_view(), name='api_project_tasks'),
+    url(r'^api/project/(?P<project_name>[\w\.-]+)/task/(?P<slug>[\w\.-]+)/$', ApiTask.as_view(), name='api_task'),
     url(r'^users/$', TasksUserList.as_view(), name='users'),
+    url(r'^users/more/$', TasksUserList.as_view(template_name='auth/user_list_rows.html'), name='users_more'),
     url(r'^tasks/$', TaskList.as_view(), name='tasks'),
+    url(r'^tasks/more/$', TaskList.as_view(template_name='tasks/task_list_rows.html'), name='tasks_more'),
 ]
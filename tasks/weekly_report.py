@@ -0,0 +1,150 @@
+import datetime
+import os
+import re
+import shutil
+import tempfile
+from django.conf import settings
+from django.db import transaction
+from django.template.loader import render_to_string
+from django.utils import timezone
+from .check_validity import check_validity
+from .models import PHASE_TRANSITIONS, Phase, Project, Task
+from .project_totals import recalculate_totals
+
+ALL_PROJECTS_FILE_NAME = 'projects.html'
+PROJECT_DIR_NAME = 'project'
+# Created in snapshot directory of week when week has been rolled over
+ROLLOVER_MARKER = '.rolled_over'
+WEEK_PATTERN = re.compile(r'^\d{4}-W\d{2}$')
+
+
+def week_label(date):
+    """ ISO week of date, for example 2017-W05 """
+    year, week, weekday = date.isocalendar()
+    return '%d-W%02d' % (year, week)
+
+
+def snapshot_dir(week):
+    return os.path.join(settings.TASKS_SNAPSHOT_DIR, week)
+
+
+def snapshot_path(week, project_name=None):
+    """ Path of saved report of all projects or of one project """
+    if project_name is None:
+        return os.path.join(snapshot_dir(week), ALL_PROJECTS_FILE_NAME)
+    return os.path.join(snapshot_dir(week), PROJECT_DIR_NAME, '%s.html' % project_name)
+
+
+def snapshot_weeks():
+    """ Weeks with saved snapshot, latest first """
+    if not os.path.isdir(settings.TASKS_SNAPSHOT_DIR):
+        return []
+    return sorted((name for name in os.listdir(settings.TASKS_SNAPSHOT_DIR) if WEEK_PATTERN.match(name)),
+                  reverse=True)
+
+
+def snapshot_project_names(week):
+    """ Names of projects with saved report in snapshot of week """
+    directory = os.path.join(snapshot_dir(week), PROJECT_DIR_NAME)
+    if not os.path.isdir(directory):
+        return []
+    return sorted(os.path.splitext(name)[0] for name in os.listdir(directory) if name.endswith('.html'))
+
+
+def is_rolled_over(week):
+    return os.path.exists(os.path.join(snapshot_dir(week), ROLLOVER_MARKER))
+
+
+def render_reports(today=None):
+    """ {relative path: html} of weekly report of all projects and of each project """
+    context = {'hide_chart': '', 'hide_text': '', 'day_cells': '', 'today': today or datetime.date.today()}
+    projects = list(Project.objects.select_related('created_by'))
+    reports = {ALL_PROJECTS_FILE_NAME: render_to_string('tasks/project_list_weekly.html', dict(
+        context, project_list=projects, messages=check_validity()))}
+    for project in projects:
+        # Fragments are already cached by the report of all projects
+        path = os.path.join(PROJECT_DIR_NAME, '%s.html' % project.name)
+        reports[path] = render_to_string('tasks/project_weekly.html', dict(context, project=project))
+    return reports
+
+
+def _write_temporary(reports):
+    """ Reports written to a new temporary directory next to the snapshots, so it can be renamed into place """
+    os.makedirs(settings.TASKS_SNAPSHOT_DIR, exist_ok=True)
+    directory = tempfile.mkdtemp(prefix='.tmp-', dir=settings.TASKS_SNAPSHOT_DIR)
+    os.mkdir(os.path.join(directory, PROJECT_DIR_NAME))
+    for path, html in reports.items():
+        with open(os.path.join(directory, path), 'w', encoding='utf-8') as report_file:
+            report_file.write(html)
+    return directory
+
+
+def _publish(directory, week):
+    """ Replace snapshot of week with directory. Week stays rolled over if it was """
+    target = snapshot_dir(week)
+    if os.path.exists(target):
+        if is_rolled_over(week):
+            open(os.path.join(directory, ROLLOVER_MARKER), 'w').close()
+        shutil.rmtree(target)
+    os.rename(directory, target)
+
+
+def save_snapshot(today=None, force=False):
+    """
+    Save weekly reports of all projects and of each project to snapshot directory of week of today.
+    Saved snapshots are not replaced unless forced. Returns week, or None if snapshot already existed
+    """
+    week = week_label(today or datetime.date.today())
+    if os.path.exists(snapshot_dir(week)) and not force:
+        return None
+    _publish(_write_temporary(render_reports(today)), week)
+    return week
+
+
+def _move_all(source_name, phase_name):
+    """
+    Move all tasks from source phase to phase with one UPDATE.
+    Returns ids of projects whose tasks were moved and number of tasks moved
+    """
+    source = Phase.objects.get_cached(source_name)
+    phase = Phase.objects.get_cached(phase_name)
+    if not phase:
+        raise ValueError('Tasks can not be moved to phase: %s' % phase_name)
+    if not source:
+        return set(), 0
+    tasks = Task.objects.filter(phase=source)
+    project_ids = set(tasks.select_for_update().order_by().values_list('project_id', flat=True).distinct())
+    values = {'phase': phase, 'edited': timezone.now()}
+    if PHASE_TRANSITIONS[phase_name][1]:
+        values['work_left'] = 0
+    return project_ids, tasks.update(**values)
+
+
+def weekly_rollover(today=None, force=False):
+    """
+    Snapshot weekly reports, then move finished tasks to done and continuing tasks to ongoing in all projects.
+    Snapshot with rollover marker is published only after the phases have been changed, so running again
+    does nothing unless forced.
+    Returns {phase name: number of tasks moved to it}, or None if week had already been rolled over
+    """
+    today = today or datetime.date.today()
+    week = week_label(today)
+    if is_rolled_over(week) and not force:
+        return None
+
+    directory = _write_temporary(render_reports(today))
+    try:
+        with transaction.atomic():
+            done_project_ids, done = _move_all('finished', 'done')
+            ongoing_project_ids, ongoing = _move_all('continuing', 'ongoing')
+            # Update does not send signals that keep totals up to date
+            recalculate_totals(done_project_ids | ongoing_project_ids)
+    except Exception:
+        shutil.rmtree(directory)
+        raise
+    open(os.path.join(directory, ROLLOVER_MARKER), 'w').close()
+    _publish(directory, week)
+    return {
+        'done': done,
+        'ongoing': ongoing,
+    }